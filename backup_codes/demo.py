@@ -1,27 +1,28 @@
-# import json
+# import orjson
 # import re
 
 # json_file_path = "cleaned_relevant_attributes.json" 
-# with open(json_file_path, 'r', encoding='utf-8') as f:
-#     products = json.load(f)
+# with open(json_file_path, 'rb') as f:
+#     products = orjson.loads(f.read())
 
 # print(products[0]["description"])
 
 
 ########################################################
-# import json
+# import orjson
 
-# records = []
-# with open("products_backup-08_19_2025.json", "r") as infile:
+# # Stream NDJSON -> JSON array one record at a time instead of building the full list
+# with open("products_backup-08_19_2025.json", "rb") as infile, open("products.json", "wb") as outfile:
+#     outfile.write(b"[\n")
 #     for i, line in enumerate(infile):
-#         records.append(json.loads(line))
-
-# with open("products.json", "w") as outfile:
-#     json.dump(records, outfile, indent=2)
+#         if i:
+#             outfile.write(b",\n")
+#         outfile.write(orjson.dumps(orjson.loads(line), option=orjson.OPT_INDENT_2))
+#     outfile.write(b"\n]")
 
 ########################################################
 
-# import json
+# import orjson
 # import random
 
 # in_path = "cleaned_relevant_attributes.json"
@@ -31,30 +32,31 @@
 # # Optional: reproducibility
 # # random.seed(42)  # [for deterministic runs]
 
-# # Pass 1: count lines (assumes JSON Lines format: one JSON object per line)
-# with open(in_path, "r", encoding="utf-8") as f:
-#     n = sum(1 for _ in f)
+# # Single pass reservoir sampling (assumes JSON Lines format: one JSON object per line)
+# records = []
+# n = 0
+# with open(in_path, "rb") as f:
+#     for i, line in enumerate(f):
+#         n += 1
+#         if i < k:
+#             records.append(orjson.loads(line))
+#         else:
+#             j = random.randint(0, i)
+#             if j < k:
+#                 records[j] = orjson.loads(line)  # only parse lines that are kept
 
 # if k > n:
 #     raise ValueError(f"Requested k={k} > number of records n={n}")
 
-# # Pick k unique line indices uniformly at random
-# chosen = set(random.sample(range(n), k))  # sampling without replacement
-
-# # Pass 2: collect selected records
-# records = []
-# with open(in_path, "r", encoding="utf-8") as f:
-#     for i, line in enumerate(f):
-#         if i in chosen:
-#             records.append(json.loads(line))
-
-# with open(out_path, "w", encoding="utf-8") as out:
-#     json.dump(records, out, indent=2, ensure_ascii=False)
+# with open(out_path, "wb") as out:
+#     out.write(orjson.dumps(records, option=orjson.OPT_INDENT_2))
 
 #############################################################
 
-# import json
+# import heapq
+# import orjson
 # import random
+# import ijson
 
 # in_path = "final_data_qdrant.json"
 # out_path = "products_10_qdrant.json"
@@ -63,21 +65,27 @@
 # # Optional: reproducible sampling
 # # random.seed(42)
 
-# with open(in_path, "r", encoding="utf-8") as f:
-#     data = json.load(f)  # data is a Python list of dicts
-
-# # Guard if fewer than k items
-# k = min(k, len(data))
+# # Stream the array and keep the k items with the largest random keys
+# # (uniform, without replacement); memory stays O(k) instead of O(file)
+# heap = []
+# with open(in_path, "rb") as f:
+#     for i, item in enumerate(ijson.items(f, "item", use_float=True)):
+#         key = random.random()
+#         if len(heap) < k:
+#             heapq.heappush(heap, (key, i, item))
+#         elif key > heap[0][0]:
+#             heapq.heapreplace(heap, (key, i, item))
 
-# sampled = random.sample(data, k)  # uniform, without replacement
+# # Fewer than k items simply yields all of them
+# sampled = [item for _, _, item in heap]
 
-# with open(out_path, "w", encoding="utf-8") as out:
-#     json.dump(sampled, out, indent=2, ensure_ascii=False)
+# with open(out_path, "wb") as out:
+#     out.write(orjson.dumps(sampled, option=orjson.OPT_INDENT_2))
 
 
 #############################################################
 
-# import json
+# import orjson
 
 # # Input and output file paths
 # input_file = "products_backup-08_19_2025.json"       # your input NDJSON file
@@ -91,31 +99,31 @@
 # filtered_products = []
 
 # # Read NDJSON line by line
-# with open(input_file, "r", encoding="utf-8") as f:
+# with open(input_file, "rb") as f:
 #     for line in f:
 #         line = line.strip()
 #         if not line:
 #             continue  # skip empty lines
 
 #         try:
-#             obj = json.loads(line)  # each line is a JSON object
+#             obj = orjson.loads(line)  # each line is a JSON object
 #             source = obj.get("_source", {})
 
 #             # Extract only the required fields
 #             filtered = {field: source.get(field, None) for field in fields_to_extract}
 #             filtered_products.append(filtered)
-#         except json.JSONDecodeError:
+#         except orjson.JSONDecodeError:
 #             print(f"Skipping invalid line: {line[:50]}...")
 
 # # Save into a new JSON file
-# with open(output_file, "w", encoding="utf-8") as f:
-#     json.dump(filtered_products, f, ensure_ascii=False, indent=2)
+# with open(output_file, "wb") as f:
+#     f.write(orjson.dumps(filtered_products, option=orjson.OPT_INDENT_2))
 
 # print(f"✅ Extracted {len(filtered_products)} products to {output_file}")
 
 ##################################################################
 
-# import json
+# import orjson
 # import re
 
 # # Input and output file paths
@@ -123,42 +131,35 @@
 # output_file = "final_data_neo4j.json"
 
 # # Load JSON
-# with open(input_file, "r", encoding="utf-8") as f:
-#     products = json.load(f)
+# with open(input_file, "rb") as f:
+#     products = orjson.loads(f.read())
 
-# # Clean all descriptions
-# for product in products:
-#     if "description" in product and isinstance(product["description"], str):
-#         # Remove bullets at start of line
-#         cleaned = re.sub(r'^[●•]\s*', '', product["description"], flags=re.MULTILINE)
-#         # Replace line breaks with space
-#         cleaned = cleaned.replace("\n", " ")
-#         # Collapse extra spaces (optional)
-#         cleaned = re.sub(r'\s+', ' ', cleaned).strip()
-#         product["description"] = cleaned
+# # Bullets at start of line, and runs of whitespace (line breaks included)
+# _BULLET_WS = re.compile(r'^[●•]\s*', re.MULTILINE)
+# _MULTI_WS = re.compile(r'\s+')
+
+# def _clean(s):
+#     return _MULTI_WS.sub(' ', _BULLET_WS.sub('', s)).strip() if isinstance(s, str) else s
 
+# # Clean both description fields in a single pass
 # for product in products:
-#     if "short_description" in product and isinstance(product["short_description"], str):
-#         # Remove bullets at start of line
-#         cleaned = re.sub(r'^[●•]\s*', '', product["short_description"], flags=re.MULTILINE)
-#         # Replace line breaks with space
-#         cleaned = cleaned.replace("\n", " ")
-#         # Collapse extra spaces (optional)
-#         cleaned = re.sub(r'\s+', ' ', cleaned).strip()
-#         product["short_description"] = cleaned
+#     for key in ("description", "short_description"):
+#         value = product.get(key)
+#         if value:
+#             product[key] = _clean(value)
 
 # # Save cleaned JSON into a new file
-# with open(output_file, "w", encoding="utf-8") as f:
-#     json.dump(products, f, ensure_ascii=False, indent=2)
+# with open(output_file, "wb") as f:
+#     f.write(orjson.dumps(products, option=orjson.OPT_INDENT_2))
 
 
 ###################################################################
 
-# import json
+# import orjson
 
 # # Load your JSON (replace 'data.json' with your actual file path)
-# with open("final_data_qdrant.json", "r") as f:
-#     data = json.load(f)
+# with open("final_data_qdrant.json", "rb") as f:
+#     data = orjson.loads(f.read())
 
 # def is_empty(value):
 #     return not isinstance(value, str) or not value.strip()
@@ -171,10 +172,10 @@
 # print(f"Number of blocks with empty description AND empty short_description: {empty_both}")
 
 #check for item in name
-# import json
+# import orjson
 
-# with open("final_data_neo4j.json", "r") as f:
-#     data = json.load(f)
+# with open("final_data_neo4j.json", "rb") as f:
+#     data = orjson.loads(f.read())
 
 # search_str = "CX-112"
 
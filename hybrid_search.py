@@ -1,12 +1,111 @@
 import os
 import sys
 import re
+import functools
+import itertools
+import threading
+from collections import OrderedDict
+from types import MappingProxyType
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Set, Tuple
-from neo4j import GraphDatabase
+import torch
+from neo4j import GraphDatabase, READ_ACCESS
 from sentence_transformers import SentenceTransformer
 from qdrant_client import QdrantClient
+from qdrant_client.models import SearchRequest, SearchParams, QuantizationSearchParams
 import numpy as np
 
+from search_utils import CODE_HYPHEN, ThreadSessions, escape_lucene, find_mixed_codes
+
+
+# Neo4j search strategies in the order their results are merged, with the
+# weight applied when a strategy is first to find a product and the boost
+# applied when it confirms a product already found by an earlier strategy
+METHOD_ORDER = {'precomputed': 0, 'fulltext': 1, 'attribute': 2}
+METHOD_WEIGHTS = {'precomputed': 3.0, 'fulltext': 2.0, 'attribute': 1.5}
+METHOD_BOOSTS = {'precomputed': 0.0, 'fulltext': 0.5, 'attribute': 0.3}
+
+# All three Neo4j search strategies run in a single round-trip; each branch is
+# tagged with the method that produced it:
+#   1. Pre-computed terms search (fastest for codes)
+#   2. Full-text search
+#   3. Attribute search
+# A failing branch fails the whole statement, so $search_term must be passed
+# through escape_lucene: raw Lucene syntax errors would also drop the
+# precomputed and attribute results
+NEO4J_SEARCH_QUERY = """
+    CALL {
+        UNWIND $search_terms AS term
+        MATCH (p:Product)
+        WHERE term IN p.search_terms_list
+        WITH p, count(*) as matches
+        RETURN p.id as product_id, p.name as product_name, 
+               p.short_description as description, matches as score,
+               'precomputed' as method
+        ORDER BY score DESC
+        LIMIT $limit
+
+        UNION ALL
+
+        CALL db.index.fulltext.queryNodes('product_search', $search_term)
+        YIELD node, score
+        RETURN node.id as product_id, node.name as product_name,
+               node.short_description as description, score,
+               'fulltext' as method
+        ORDER BY score DESC
+        LIMIT $limit
+
+        UNION ALL
+
+        UNWIND $search_terms AS term
+        MATCH (a:Attribute)
+        WHERE a.key_lc CONTAINS term OR a.value_lc CONTAINS term
+        WITH DISTINCT a
+        MATCH (p:Product)-[:HAS_ATTRIBUTE]->(a)
+        WITH p, COUNT(DISTINCT a) as matching_attrs
+        RETURN p.id as product_id, p.name as product_name,
+               p.short_description as description, matching_attrs as score,
+               'attribute' as method
+        ORDER BY score DESC
+        LIMIT $limit
+    }
+    RETURN product_id, product_name, description, score, method
+"""
+
+# Query preprocessing patterns, compiled once
+# Word delimiters other than whitespace; str.split() handles the whitespace
+_DELIM_TABLE = str.maketrans({c: ' ' for c in '-_,;:.()'})
+_HAS_HYPHEN_CODE = re.compile(r'[A-Z0-9]-[A-Z0-9]')
+
+# Supported values for embedding_precision (see _load_model)
+EMBEDDING_PRECISIONS = ('fp32', 'int8', 'fp16', 'bf16')
+
+# Query embeddings kept in memory, and the token cap for queries (product
+# queries are short, so padding/attention stays small)
+EMBEDDING_CACHE_SIZE = 4096
+QUERY_MAX_SEQ_LENGTH = 64
+
+# The only payload fields search results use; the rest stays on the server
+QDRANT_PAYLOAD_FIELDS = ['product_id', 'name', 'short_description']
+# Scan the int8-quantized vectors, then rescore 3x the requested candidates
+# against the original float32 vectors
+QDRANT_SEARCH_PARAMS = SearchParams(
+    quantization=QuantizationSearchParams(ignore=False, rescore=True, oversampling=3.0)
+)
+
+# Fusion weights and candidate limits per query type; the side that dominates
+# the ranking fetches 20 candidates, the other side only half as many
+QUERY_STRATEGIES = {
+    'code': dict(neo4j_weight=0.8, qdrant_weight=0.2, neo4j_limit=20, qdrant_limit=10,
+                 label="Product code detected - favoring exact match"),
+    'descriptive': dict(neo4j_weight=0.3, qdrant_weight=0.7, neo4j_limit=10, qdrant_limit=20,
+                        label="Descriptive - favoring semantic search"),
+    'attribute': dict(neo4j_weight=0.7, qdrant_weight=0.3, neo4j_limit=20, qdrant_limit=10,
+                      label="Attribute-based - favoring graph search"),
+    'general': dict(neo4j_weight=0.5, qdrant_weight=0.5, neo4j_limit=20, qdrant_limit=20,
+                    label="General - using balanced approach"),
+}
+
 
 class HybridSearchSystem:
     
@@ -15,195 +114,224 @@ class HybridSearchSystem:
                  neo4j_user="neo4j", 
                  neo4j_password="password",
                  qdrant_host="localhost",
-                 qdrant_port=6334):
+                 qdrant_port=6334,
+                 qdrant_grpc_port=6333,
+                 embedding_precision="fp32"):
         
         try:
             self.neo4j_driver = GraphDatabase.driver(neo4j_uri, auth=(neo4j_user, neo4j_password))
+            # Long-lived read-only sessions instead of one per query, one for
+            # the main thread and one per search pool thread
+            self._sessions = ThreadSessions(self.neo4j_driver, default_access_mode=READ_ACCESS)
             self._verify_neo4j_connection()
         except Exception as e:
             print(f"Failed to connect to Neo4j: {e}")
             sys.exit(1)
         
         try:
-            self.qdrant_client = QdrantClient(host=qdrant_host, port=qdrant_port, timeout=30)
+            self.qdrant_client = QdrantClient(host=qdrant_host, port=qdrant_port, 
+                                              grpc_port=qdrant_grpc_port, prefer_grpc=True, timeout=30)
             self.collection_name = "products"
             collection_info = self.qdrant_client.get_collection(self.collection_name)
-            print(f"Connected to Qdrant at http://{qdrant_host}:{qdrant_port}")
+            print(f"Connected to Qdrant at {qdrant_host} (gRPC port {qdrant_grpc_port})")
         except Exception as e:
             print(f"Failed to connect to Qdrant: {e}")
             sys.exit(1)
         
-        self.model = SentenceTransformer("all-MiniLM-L6-v2")
+        # Checked up front, since the model itself is only loaded on first use
+        if embedding_precision not in EMBEDDING_PRECISIONS:
+            raise ValueError(f"Unsupported embedding precision: {embedding_precision}")
+        self._embedding_precision = embedding_precision
+        # Repeated queries skip the transformer forward pass
+        self._embedding_cache = OrderedDict()
+        self._embedding_lock = threading.Lock()
+        # Re-running a query (e.g. to toggle verbose) skips the regex analysis
+        self._analyze = functools.lru_cache(maxsize=256)(self.analyze_query)
+        # One search function per query type, with its weights and limits bound
+        self._strategies = {name: functools.partial(self._search_weighted, **params)
+                            for name, params in QUERY_STRATEGIES.items()}
+        
+        # Neo4j and Qdrant are independent network calls, so run them side by side
+        self._pool = ThreadPoolExecutor(max_workers=2)
+    
+    @functools.cached_property
+    def model(self):
+        # Loaded on the first Qdrant search rather than at startup
+        return self._load_model(self._embedding_precision)
+    
+    def _load_model(self, precision):
+        # Dynamically quantized Linear layers only have CPU kernels, so an int8
+        # model must stay on the CPU even when a GPU is available
+        device = "cpu" if precision == "int8" else None
+        model = SentenceTransformer("all-MiniLM-L6-v2", device=device)
+        
+        if precision == "int8":
+            # Dynamic int8 quantization of the Linear layers (VNNI/AVX2 kernels on CPU)
+            model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        elif precision == "fp16":
+            # Half precision only pays off on GPU tensor cores; CPU fp16 matmuls are slow
+            if torch.cuda.is_available():
+                model = model.half()
+            else:
+                print("fp16 embeddings need a CUDA device, using fp32")
+        elif precision == "bf16":
+            # Native bf16 weights on GPU or on CPUs with AMX tiles
+            amx = getattr(torch.cpu, '_is_amx_tile_supported', lambda: False)()
+            if torch.cuda.is_available() or amx:
+                model = model.to(dtype=torch.bfloat16)
+            else:
+                print("bf16 embeddings need a CUDA device or AMX, using fp32")
+        
+        model.max_seq_length = QUERY_MAX_SEQ_LENGTH
+        return model
     
     def _verify_neo4j_connection(self):
-        with self.neo4j_driver.session() as session:
-            result = session.run("MATCH (p:Product) RETURN count(p) as count")
-            count = result.single()['count']
-            if count == 0:
-                raise Exception("No products found in Neo4j database")
-            print(f"Connected to Neo4j. Found {count} products")
+        result = self._sessions.get().run("MATCH (p:Product) RETURN count(p) as count")
+        count = result.single()['count']
+        if count == 0:
+            raise Exception("No products found in Neo4j database")
+        print(f"Connected to Neo4j. Found {count} products")
     
     def close(self):
+        self._pool.shutdown(wait=True)
+        self._sessions.close()
         self.neo4j_driver.close()
     
     def analyze_query(self, query):
+        n_words = len(query.split())
+        query_lower = query.lower()
         analysis = {
             'has_product_code': False,
-            'code_patterns': [],
-            'is_short': len(query.split()) <= 3,
-            'is_descriptive': len(query.split()) > 5,
+            'code_patterns': (),
+            'is_short': n_words <= 3,
+            'is_descriptive': n_words > 5,
             'has_attributes': False,
-            'normalized_terms': set()
+            'query_lower': query_lower,
+            'normalized_terms': ()
         }
         
         # Check for product codes (e.g., AIUR-06-102J, CX-112, etc.)
-        code_patterns = [
-            r'\b[A-Z0-9]+(?:-[A-Z0-9]+)+\b',  # Hyphenated codes
-            r'\b(?=.*[A-Z])(?=.*[0-9])[A-Z0-9]{4,}\b'  # Mixed alphanumeric
-        ]
-        
-        for pattern in code_patterns:
-            matches = re.findall(pattern, query.upper())
+        q_up = query.upper()
+        for matches in (CODE_HYPHEN.findall(q_up), find_mixed_codes(q_up)):
             if matches:
                 analysis['has_product_code'] = True
-                analysis['code_patterns'].extend(matches)
+                analysis['code_patterns'] += tuple(matches)
         
         # Check for attribute-like patterns (key:value, key=value)
-        if ':' in query or '=' in query or any(word in query.lower() for word in ['with', 'having', 'type', 'category']):
+        if ':' in query or '=' in query or any(word in query_lower for word in ['with', 'having', 'type', 'category']):
             analysis['has_attributes'] = True
         
-        # Normalize query terms
-        analysis['normalized_terms'] = self._normalize_search_terms(query)
+        # Normalize query terms; a tuple goes to the Neo4j driver without conversion
+        analysis['normalized_terms'] = tuple(self._normalize_search_terms(query, query_lower))
         
-        return analysis
+        # Read-only, since the result may be cached and shared between calls
+        return MappingProxyType(analysis)
     
-    def _normalize_search_terms(self, query):
-        terms = set()
-        terms.add(query.lower())
-        
-        # Handle product codes
-        if re.match(r'.*[A-Z0-9]+-[A-Z0-9]+.*', query.upper()):
-            terms.add(query.upper())
-            terms.add(query.lower())
-            terms.add(query.replace('-', '').upper())
-            terms.add(query.replace('-', '').lower())
-            terms.add(query.replace('-', ' ').upper())
-            terms.add(query.replace('-', ' ').lower())
+    def _normalize_search_terms(self, query, query_lower):
+        terms = {query_lower}
+        
+        # Handle product codes: joined and spaced variants in both cases
+        q_up = query.upper()
+        if _HAS_HYPHEN_CODE.search(q_up):
+            terms.update((q_up,
+                          q_up.replace('-', ''), query_lower.replace('-', ''),
+                          q_up.replace('-', ' '), query_lower.replace('-', ' ')))
         
         # Split into words
-        words = re.split(r'[\s\-_,;:.()]+', query)
-        for word in words:
-            word = word.strip().lower()
-            if len(word) > 1:
-                terms.add(word)
+        words = query_lower.translate(_DELIM_TABLE).split()
+        terms.update(word for word in words if len(word) > 1)
         
         return terms
     
     def search_neo4j(self, query, normalized_terms, limit = 20):
 
-        with self.neo4j_driver.session() as session:
-            all_results = {}
-            
-            # Strategy 1: Pre-computed terms search (fastest for codes)
-            terms_list = list(normalized_terms)
-            cypher_precomputed = """
-                MATCH (p:Product)
-                WHERE ANY(term IN $search_terms WHERE term IN p.search_terms_list)
-                WITH p, SIZE([term IN $search_terms WHERE term IN p.search_terms_list]) as matches
-                WHERE matches > 0
-                RETURN p.id as product_id, p.name as product_name, 
-                       p.short_description as description, matches as score
-                ORDER BY score DESC
-                LIMIT $limit
-            """
-            
-            try:
-                result = session.run(cypher_precomputed, search_terms=terms_list, limit=limit)
-                for record in result:
-                    pid = record['product_id']
-                    if pid not in all_results:
-                        all_results[pid] = {
-                            'id': pid,
-                            'name': record['product_name'],
-                            'description': record['description'] or "",
-                            'neo4j_score': float(record['score']) * 3.0,
-                            'methods': ['precomputed']
-                        }
-            except Exception as e:
-                print(f"Neo4j precomputed search error: {e}")
-            
-            # Strategy 2: Full-text search
-            try:
-                cypher_fulltext = """
-                    CALL db.index.fulltext.queryNodes('product_search', $search_term)
-                    YIELD node, score
-                    RETURN node.id as product_id, node.name as product_name,
-                           node.short_description as description, score
-                    ORDER BY score DESC
-                    LIMIT $limit
-                """
-                
-                result = session.run(cypher_fulltext, search_term=query, limit=limit)
-                for record in result:
-                    pid = record['product_id']
-                    if pid not in all_results:
-                        all_results[pid] = {
-                            'id': pid,
-                            'name': record['product_name'],
-                            'description': record['description'] or "",
-                            'neo4j_score': float(record['score']) * 2.0,
-                            'methods': ['fulltext']
-                        }
-                    else:
-                        all_results[pid]['neo4j_score'] += float(record['score']) * 0.5
-                        all_results[pid]['methods'].append('fulltext')
-            except Exception as e:
-                print(f"Neo4j fulltext search error: {e}")
-            
-            # Strategy 3: Attribute search
-            cypher_attributes = """
-                MATCH (p:Product)-[:HAS_ATTRIBUTE]->(a:Attribute)
-                WHERE ANY(term IN $search_terms WHERE 
-                         toLower(a.key) CONTAINS term OR 
-                         toLower(a.value) CONTAINS term)
-                WITH p, COUNT(DISTINCT a) as matching_attrs
-                RETURN p.id as product_id, p.name as product_name,
-                       p.short_description as description, matching_attrs as score
-                ORDER BY score DESC
-                LIMIT $limit
-            """
-            
-            try:
-                result = session.run(cypher_attributes, search_terms=terms_list, limit=limit)
-                for record in result:
-                    pid = record['product_id']
-                    if pid not in all_results:
-                        all_results[pid] = {
-                            'id': pid,
-                            'name': record['product_name'],
-                            'description': record['description'] or "",
-                            'neo4j_score': float(record['score']) * 1.5,
-                            'methods': ['attribute']
-                        }
-                    else:
-                        all_results[pid]['neo4j_score'] += float(record['score']) * 0.3
-                        all_results[pid]['methods'].append('attribute')
-            except Exception as e:
-                print(f"Neo4j attribute search error: {e}")
-            
-            return list(all_results.values())
+        session = self._sessions.get()
+        all_results = {}
+        if not isinstance(normalized_terms, (list, tuple)):
+            normalized_terms = list(normalized_terms)
+        
+        try:
+            result = session.run(NEO4J_SEARCH_QUERY, search_terms=normalized_terms, 
+                                 search_term=escape_lucene(query), limit=limit)
+            # Plain value lists in RETURN column order, without Record wrappers
+            rows = sorted(result.values(), key=lambda row: METHOD_ORDER[row[4]])
+        except Exception as e:
+            print(f"Neo4j search error: {e}")
+            return []
+        
+        # Fold duplicates: the first method to find a product sets its base
+        # score, later methods add a smaller boost
+        for pid, name, description, score, method in rows:
+            score = float(score)
+            if pid not in all_results:
+                all_results[pid] = {
+                    'id': pid,
+                    'name': name,
+                    'description': description or "",
+                    'neo4j_score': score * METHOD_WEIGHTS[method],
+                    'methods': [method]
+                }
+            else:
+                all_results[pid]['neo4j_score'] += score * METHOD_BOOSTS[method]
+                all_results[pid]['methods'].append(method)
+        
+        return list(all_results.values())
+    
+    def _encode_queries(self, queries):
+        # Look every query up in the LRU cache and embed all misses in one batch
+        cache = self._embedding_cache
+        with self._embedding_lock:
+            missing = [q for q in dict.fromkeys(queries) if q not in cache]
+        
+        if missing:
+            # Upcast to fp32 when the model runs in half precision
+            vectors = self.model.encode(missing, batch_size=32, normalize_embeddings=True, 
+                                        convert_to_numpy=True).astype(np.float32, copy=False)
+            # Cached and shared between calls, so guard against in-place edits
+            vectors.setflags(write=False)
+            with self._embedding_lock:
+                cache.update(zip(missing, vectors))
+        
+        with self._embedding_lock:
+            encoded = []
+            for q in queries:
+                cache.move_to_end(q)
+                encoded.append(cache[q])
+            while len(cache) > EMBEDDING_CACHE_SIZE:
+                cache.popitem(last=False)
+        return encoded
     
-    def search_qdrant(self, query, limit = 20):
+    def search_qdrant(self, query, limit = 20, code_patterns = ()):
 
-        query_vector = self.model.encode(query).tolist()
+        # The model is uncased, so lowercasing only improves cache hits
+        texts = [query.strip().lower()] + [code.lower() for code in dict.fromkeys(code_patterns)]
+        vectors = self._encode_queries(texts)
+        query_vector = vectors[0]
         
         try:
-            results = self.qdrant_client.search(
-                collection_name=self.collection_name,
-                query_vector=query_vector,
-                limit=limit,
-                with_payload=True
-            )
+            if code_patterns:
+                # One batched request for the query plus each detected product code;
+                # every point keeps its best score across the variants
+                batches = self.qdrant_client.search_batch(
+                    collection_name=self.collection_name,
+                    requests=[SearchRequest(vector=v.tolist(), limit=limit, 
+                                            params=QDRANT_SEARCH_PARAMS,
+                                            with_payload=QDRANT_PAYLOAD_FIELDS) 
+                              for v in vectors]
+                )
+                best = {}
+                for result in itertools.chain.from_iterable(batches):
+                    if result.id not in best or result.score > best[result.id].score:
+                        best[result.id] = result
+                results = sorted(best.values(), key=lambda r: r.score, reverse=True)[:limit]
+            else:
+                results = self.qdrant_client.search(
+                    collection_name=self.collection_name,
+                    query_vector=query_vector,
+                    search_params=QDRANT_SEARCH_PARAMS,
+                    limit=limit,
+                    with_payload=QDRANT_PAYLOAD_FIELDS
+                )
             
             qdrant_results = []
             for result in results:
@@ -227,90 +355,91 @@ class HybridSearchSystem:
         
         print(f"\nAnalyzing query: '{query}'")
         
-        analysis = self.analyze_query(query)
+        analysis = self._analyze(query)
         
-        # Determine weights based on query analysis
+        return self._strategies[self._query_type(analysis)](query, analysis, limit)
+    
+    @staticmethod
+    def _query_type(analysis):
         if analysis['has_product_code']:
-            # Product codes: heavily favor Neo4j
-            neo4j_weight = 0.8
-            qdrant_weight = 0.2
-            print("  Query type: Product code detected - favoring exact match")
-
-        elif analysis['is_descriptive']:
-            # Long descriptive queries: favor Qdrant
-            neo4j_weight = 0.3
-            qdrant_weight = 0.7
-            print("  Query type: Descriptive - favoring semantic search")
+            return 'code'
+        if analysis['is_descriptive']:
+            return 'descriptive'
+        if analysis['has_attributes']:
+            return 'attribute'
+        return 'general'
+    
+    def _search_weighted(self, query, analysis, limit, neo4j_weight, qdrant_weight, 
+                         neo4j_limit, qdrant_limit, label):
 
-        elif analysis['has_attributes']:
-            # Attribute-based: favor Neo4j
-            neo4j_weight = 0.7
-            qdrant_weight = 0.3
-            print("  Query type: Attribute-based - favoring graph search")
-            
+        print(f"  Query type: {label}")
+        
+        # Get results from both systems concurrently
+        print("  Searching Neo4j and Qdrant...")
+        fut_neo4j = self._pool.submit(self.search_neo4j, query, analysis['normalized_terms'], neo4j_limit)
+        fut_qdrant = self._pool.submit(self.search_qdrant, query, qdrant_limit, analysis['code_patterns'])
+        neo4j_results = fut_neo4j.result()
+        qdrant_results = fut_qdrant.result()
+        print(f"    Neo4j: found {len(neo4j_results)} results")
+        print(f"    Qdrant: found {len(qdrant_results)} results")
+        
+        if not neo4j_results and not qdrant_results:
+            return []
+        
+        # Combine and rank using weighted reciprocal rank fusion, vectorized
+        # over the union of product ids from both systems
+        n_neo4j = len(neo4j_results)
+        all_ids = np.array([r['id'] for r in neo4j_results] + [r['id'] for r in qdrant_results])
+        ids, inverse = np.unique(all_ids, return_inverse=True)
+        final_scores = np.zeros(len(ids), dtype=np.float32)
+        
+        # Neo4j: reciprocal rank score with Neo4j internal score boost
+        # (adding 10 to the rank avoids over-weighting top results)
+        neo4j_pos = inverse[:n_neo4j]
+        neo4j_scores = np.fromiter((r['neo4j_score'] for r in neo4j_results), dtype=np.float32, count=n_neo4j)
+        neo4j_internal = neo4j_scores / (neo4j_scores.max(initial=0.0) + 0.001)
+        neo4j_rr = 1.0 / (np.arange(1, n_neo4j + 1, dtype=np.float32) + 10)
+        final_scores[neo4j_pos] = neo4j_weight * (0.7 * neo4j_rr + 0.3 * neo4j_internal)
+        
+        # Qdrant: reciprocal rank of each product's best hit
+        qdrant_pos, qdrant_first = np.unique(inverse[n_neo4j:], return_index=True)
+        final_scores[qdrant_pos] += qdrant_weight / (qdrant_first + 11.0)
+        
+        # Bonus for appearing in both
+        in_neo4j = np.zeros(len(ids), dtype=bool)
+        in_neo4j[neo4j_pos] = True
+        final_scores[qdrant_pos[in_neo4j[qdrant_pos]]] *= 1.2
+        
+        # Select the top K with a linear-time partition, then sort only those
+        if len(final_scores) > limit:
+            top = np.argpartition(-final_scores, limit)[:limit]
         else:
-            # Balanced approach
-            neo4j_weight = 0.5
-            qdrant_weight = 0.5
-            print("  Query type: General - using balanced approach")
-        
-        # Get results from both systems
-        print("  Searching Neo4j")
-        neo4j_results = self.search_neo4j(query, analysis['normalized_terms'], limit=20)
-        print(f"    Found {len(neo4j_results)} results")
-        
-        print("  Searching Qdrant...")
-        qdrant_results = self.search_qdrant(query, limit=20)
-        print(f"    Found {len(qdrant_results)} results")
-        
-        # Combine and rank using weighted reciprocal rank fusion
-        combined_scores = {}
-        
-        # Process Neo4j results
-        for rank, result in enumerate(neo4j_results, 1):
-            pid = result['id']
-            # Reciprocal rank score with Neo4j internal score boost
-            rr_score = 1.0 / (rank + 10)  # Adding 10 to avoid over-weighting top results
-            internal_score = result['neo4j_score'] / (max([r['neo4j_score'] for r in neo4j_results]) + 0.001)
-            
-            combined_scores[pid] = {
-                'id': pid,
-                'name': result['name'],
-                'description': result['description'],
-                'neo4j_rank': rank,
-                'neo4j_score': internal_score,
-                'neo4j_methods': result.get('methods', []),
-                'final_score': neo4j_weight * (0.7 * rr_score + 0.3 * internal_score)
-            }
+            top = np.arange(len(final_scores))
+        top = top[np.argsort(-final_scores[top], kind='stable')]
         
-        # Process Qdrant results
-        for rank, result in enumerate(qdrant_results, 1):
-            pid = result['id']
-            rr_score = 1.0 / (rank + 10)
-            
-            if pid in combined_scores:
-                # Product found in both - boost score
-                combined_scores[pid]['qdrant_rank'] = rank
-                combined_scores[pid]['qdrant_score'] = result['qdrant_score']
-                combined_scores[pid]['final_score'] += qdrant_weight * rr_score
-                # Bonus for appearing in both
-                combined_scores[pid]['final_score'] *= 1.2
-            else:
-                combined_scores[pid] = {
-                    'id': pid,
-                    'name': result['name'],
-                    'description': result['description'],
-                    'qdrant_rank': rank,
-                    'qdrant_score': result['qdrant_score'],
-                    'final_score': qdrant_weight * rr_score
-                }
+        neo4j_index = np.full(len(ids), -1)
+        neo4j_index[neo4j_pos] = np.arange(n_neo4j)
+        qdrant_index = np.full(len(ids), -1)
+        qdrant_index[qdrant_pos] = qdrant_first
         
-        # Sort by final score and return top K
-        sorted_results = sorted(
-            combined_scores.values(),
-            key=lambda x: x['final_score'],
-            reverse=True
-        )[:limit]
+        sorted_results = []
+        for i in top:
+            n_idx, q_idx = int(neo4j_index[i]), int(qdrant_index[i])
+            source = neo4j_results[n_idx] if n_idx >= 0 else qdrant_results[q_idx]
+            result = {
+                'id': source['id'],
+                'name': source['name'],
+                'description': source['description']
+            }
+            if n_idx >= 0:
+                result['neo4j_rank'] = n_idx + 1
+                result['neo4j_score'] = float(neo4j_internal[n_idx])
+                result['neo4j_methods'] = neo4j_results[n_idx].get('methods', [])
+            if q_idx >= 0:
+                result['qdrant_rank'] = q_idx + 1
+                result['qdrant_score'] = qdrant_results[q_idx]['qdrant_score']
+            result['final_score'] = float(final_scores[i])
+            sorted_results.append(result)
         
         return sorted_results
     
@@ -383,13 +512,17 @@ def main():
     neo4j_password = os.environ.get('NEO4J_PASSWORD', 'password')
     qdrant_host = os.environ.get('QDRANT_HOST', 'localhost')
     qdrant_port = int(os.environ.get('QDRANT_PORT', '6334'))
+    qdrant_grpc_port = int(os.environ.get('QDRANT_GRPC_PORT', '6333'))
+    embedding_precision = os.environ.get('EMBEDDING_PRECISION', 'fp32')
     
     search_system = HybridSearchSystem(
         neo4j_uri=neo4j_uri,
         neo4j_user=neo4j_user,
         neo4j_password=neo4j_password,
         qdrant_host=qdrant_host,
-        qdrant_port=qdrant_port
+        qdrant_port=qdrant_port,
+        qdrant_grpc_port=qdrant_grpc_port,
+        embedding_precision=embedding_precision
     )
     
     try:
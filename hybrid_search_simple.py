@@ -1,10 +1,89 @@
 import os
 import sys
 import re
+import time
+import functools
+import heapq
+import threading
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Set
+import torch
 from neo4j import GraphDatabase
 from sentence_transformers import SentenceTransformer
 from qdrant_client import QdrantClient
+from qdrant_client.models import SearchRequest, SearchParams, QuantizationSearchParams
+import numpy as np
+
+from search_utils import ThreadSessions, escape_lucene
+
+# Query normalization patterns, compiled once
+_CODE_RE = re.compile(r'[A-Z0-9]-[A-Z0-9]')  # Hyphenated product code anywhere in the query
+_SPLIT_RE = re.compile(r'[\s\-_,;:.()]+')
+
+# Weight applied to each Neo4j strategy's score; scores from every strategy
+# that finds a product are summed
+SOURCE_WEIGHTS = {'precomputed': 3.0, 'fulltext': 2.0, 'attribute': 1.2}
+
+# Recent hybrid results kept per (query, weights), and how long they stay valid
+RESULT_CACHE_SIZE = 128
+RESULT_CACHE_TTL = 120.0  # seconds
+
+# Token cap for query embeddings; product queries are short
+QUERY_MAX_SEQ_LENGTH = 64
+
+# Query embeddings kept in memory, shared by single and batched searches
+EMBEDDING_CACHE_SIZE = 512
+
+# Rank offset for reciprocal rank fusion (the usual k=60)
+RRF_K = 60
+
+# The products collection is int8-quantized by populate_qdrant.py; scan the
+# quantized vectors, then rescore 2x the requested candidates in float32
+QDRANT_SEARCH_PARAMS = SearchParams(
+    quantization=QuantizationSearchParams(ignore=False, rescore=True, oversampling=2.0)
+)
+
+# The three strategies as one statement, each row tagged with its source:
+#   1. Pre-computed terms search
+#   2. Full-text search
+#   3. Attribute search
+# $search_term is the escaped query (see escape_lucene), since a full-text
+# parse error would fail the other two branches as well
+NEO4J_SEARCH_QUERY = """
+    CALL {
+        MATCH (p:Product)
+        WHERE ANY(term IN $search_terms WHERE term IN p.search_terms_list)
+        WITH p, SIZE([term IN $search_terms WHERE term IN p.search_terms_list]) as matches
+        WHERE matches > 0
+        RETURN p.id as product_id, p.name as product_name, matches as score,
+               'precomputed' as source
+        ORDER BY score DESC
+        LIMIT $limit
+
+        UNION ALL
+
+        CALL db.index.fulltext.queryNodes('product_search', $search_term)
+        YIELD node, score
+        RETURN node.id as product_id, node.name as product_name, score,
+               'fulltext' as source
+        ORDER BY score DESC
+        LIMIT $limit
+
+        UNION ALL
+
+        MATCH (p:Product)-[:HAS_ATTRIBUTE]->(a:Attribute)
+        WHERE ANY(term IN $search_terms WHERE 
+                 a.key_lc CONTAINS term OR 
+                 a.value_lc CONTAINS term)
+        WITH p, COUNT(DISTINCT a) as matching_attrs
+        RETURN p.id as product_id, p.name as product_name, matching_attrs as score,
+               'attribute' as source
+        ORDER BY score DESC
+        LIMIT $limit
+    }
+    RETURN product_id, product_name, score, source
+"""
 
 class SimpleHybridSearch:
     
@@ -13,7 +92,8 @@ class SimpleHybridSearch:
                  neo4j_user="neo4j", 
                  neo4j_password="password",
                  qdrant_host="localhost",
-                 qdrant_port=6334):
+                 qdrant_port=6334,
+                 qdrant_grpc_port=6333):
         
         try:
             self.neo4j_driver = GraphDatabase.driver(neo4j_uri, auth=(neo4j_user, neo4j_password))
@@ -26,27 +106,54 @@ class SimpleHybridSearch:
             sys.exit(1)
         
         try:
-            self.qdrant_client = QdrantClient(host=qdrant_host, port=qdrant_port, timeout=30)
+            self.qdrant_client = QdrantClient(host=qdrant_host, port=qdrant_port, 
+                                              grpc_port=qdrant_grpc_port, prefer_grpc=True, timeout=30)
             self.collection_name = "products"
             collection_info = self.qdrant_client.get_collection(self.collection_name)
             print(f"Connected to Qdrant. Found {collection_info.points_count} vectors")
             
-            self.model = SentenceTransformer("all-MiniLM-L6-v2")
+            # fp16 on GPU tensor cores; CPU stays fp32, where half precision is slower
+            device = 'cuda' if torch.cuda.is_available() else 'cpu'
+            self.model = SentenceTransformer("all-MiniLM-L6-v2", device=device)
+            if device == 'cuda':
+                self.model.half()
+            self.model.max_seq_length = QUERY_MAX_SEQ_LENGTH
+            # One throwaway encode so the first real query does not pay for
+            # tokenizer and kernel initialization
+            self.model.encode(["warmup"], convert_to_numpy=True)
         except Exception as e:
             print(f"Failed to connect to Qdrant: {e}")
             sys.exit(1)
+        
+        # hybrid_search fetches its Neo4j and Qdrant candidates on these two
+        # threads at once; batch searches queue their Neo4j lookups here too
+        self._pool = ThreadPoolExecutor(max_workers=2)
+        self._sessions = ThreadSessions(self.neo4j_driver)
+        
+        # Repeated queries skip the transformer forward pass and term
+        # normalization; the embedding LRU is filled from the search threads
+        self._embedding_cache = OrderedDict()
+        self._embedding_lock = threading.Lock()
+        self._normalize = functools.lru_cache(maxsize=1024)(self.normalize_search_input)
+        # (query, neo4j_weight, qdrant_weight) -> (timestamp, results), oldest first
+        self._result_cache = OrderedDict()
+    
+    def clear_cache(self):
+        # Cached results outlive a repopulate for up to RESULT_CACHE_TTL; the
+        # interactive 'refresh' command calls this to drop them at once
+        self._result_cache.clear()
     
     def close(self):
+        self._pool.shutdown(wait=True)
+        self._sessions.close()
         self.neo4j_driver.close()
     
     def normalize_search_input(self, query):
-        terms = set()
-        terms.add(query.lower())
+        terms = {query.lower()}
         
         # Handle product codes
-        if re.match(r'.*[A-Z0-9]+-[A-Z0-9]+.*', query.upper()):
+        if _CODE_RE.search(query.upper()):
             terms.add(query.upper())
-            terms.add(query.lower())
             no_hyphen = query.replace('-', '')
             terms.add(no_hyphen.upper())
             terms.add(no_hyphen.lower())
@@ -55,195 +162,287 @@ class SimpleHybridSearch:
             terms.add(space_version.lower())
         
         # Split into words
-        words = re.split(r'[\s\-_,;:.()]+', query)
+        words = _SPLIT_RE.split(query)
         for word in words:
             word = word.strip().lower()
             if len(word) > 1:
                 terms.add(word)
         
-        return terms
+        # Immutable, since results may be cached and shared between calls
+        return frozenset(terms)
     
     def search_neo4j(self, query, limit):
 
-        search_terms = self.normalize_search_input(query)
+        # The normalized terms always include the query itself, so a blank
+        # query has to be caught before normalizing
+        if not query.strip():
+            return {}
+        search_terms = self._normalize(query)
         terms_list = list(search_terms)
         
-        neo4j_results = {}
+        def run_search(tx):
+            result = tx.run(NEO4J_SEARCH_QUERY, search_terms=terms_list, 
+                            search_term=escape_lucene(query), limit=limit)
+            return result.values()
         
-        with self.neo4j_driver.session() as session:
-            # 1. Pre-computed terms search
-            try:
-                result = session.run("""
-                    MATCH (p:Product)
-                    WHERE ANY(term IN $search_terms WHERE term IN p.search_terms_list)
-                    WITH p, SIZE([term IN $search_terms WHERE term IN p.search_terms_list]) as matches
-                    WHERE matches > 0
-                    RETURN p.id as product_id, p.name as product_name, 
-                           p.short_description as description, matches as score
-                    ORDER BY score DESC
-                    LIMIT $limit
-                """, search_terms=terms_list, limit=limit)
-                
-                for record in result:
-                    pid = record['product_id']
-                    neo4j_results[pid] = {
-                        'id': pid,
-                        'name': record['product_name'],
-                        'score': float(record['score']) * 3.0  
-                    }
-            except Exception as e:
-                print(f"Neo4j precomputed search error: {e}")
-            
-            # 2. Full-text search
-            try:
-                result = session.run("""
-                    CALL db.index.fulltext.queryNodes('product_search', $search_term)
-                    YIELD node, score
-                    RETURN node.id as product_id, node.name as product_name, score
-                    ORDER BY score DESC
-                    LIMIT $limit
-                """, search_term=query, limit=limit)
-                
-                for record in result:
-                    pid = record['product_id']
-                    if pid in neo4j_results:
-                        neo4j_results[pid]['score'] += float(record['score']) * 2.0
-                    else:
-                        neo4j_results[pid] = {
-                            'id': pid,
-                            'name': record['product_name'],
-                            'score': float(record['score']) * 2.0
-                        }
-            except Exception as e:
-                print(f"Neo4j fulltext search error: {e}")
-            
-            # 3. Attribute search
-            try:
-                result = session.run("""
-                    MATCH (p:Product)-[:HAS_ATTRIBUTE]->(a:Attribute)
-                    WHERE ANY(term IN $search_terms WHERE 
-                             toLower(a.key) CONTAINS term OR 
-                             toLower(a.value) CONTAINS term)
-                    WITH p, COUNT(DISTINCT a) as matching_attrs
-                    RETURN p.id as product_id, p.name as product_name, matching_attrs as score
-                    ORDER BY score DESC
-                    LIMIT $limit
-                """, search_terms=terms_list, limit=limit)
-                
-                for record in result:
-                    pid = record['product_id']
-                    if pid in neo4j_results:
-                        neo4j_results[pid]['score'] += float(record['score']) * 1.2
-                    else:
-                        neo4j_results[pid] = {
-                            'id': pid,
-                            'name': record['product_name'],
-                            'score': float(record['score']) * 1.2
-                        }
-            except Exception as e:
-                print(f"Neo4j attribute search error: {e}")
+        # All three strategies in one round-trip and one read transaction
+        try:
+            rows = self._sessions.get().execute_read(run_search)
+        except Exception as e:
+            print(f"Neo4j search error: {e}")
+            return {}
         
-        return neo4j_results
+        # Sum the weighted score of every strategy that found the product
+        neo4j_results = defaultdict(lambda: {'id': None, 'name': '', 'score': 0.0})
+        for pid, name, score, source in rows:
+            entry = neo4j_results[pid]
+            entry['id'] = pid
+            entry['name'] = name
+            entry['score'] += float(score) * SOURCE_WEIGHTS[source]
+        
+        # Plain dict, so later lookups cannot create empty entries
+        return dict(neo4j_results)
+    
+    def _encode_queries(self, queries):
+        # Cached embeddings first; the misses are encoded in one forward pass
+        cache = self._embedding_cache
+        with self._embedding_lock:
+            vectors = {q: cache[q] for q in queries if q in cache}
+        missing = [q for q in dict.fromkeys(queries) if q not in vectors]
+        
+        if missing:
+            encoded = self.model.encode(missing, batch_size=64, convert_to_numpy=True)
+            vectors.update((q, tuple(v)) for q, v in zip(missing, encoded.tolist()))
+        
+        with self._embedding_lock:
+            for q in vectors:
+                cache[q] = vectors[q]
+                cache.move_to_end(q)
+            while len(cache) > EMBEDDING_CACHE_SIZE:
+                cache.popitem(last=False)
+        return [list(vectors[q]) for q in queries]
     
     def search_qdrant(self, query, limit):
 
-        query_vector = self.model.encode(query).tolist()
+        query_vector = self._encode_queries([query])[0]
         qdrant_results = {}
         
         try:
             results = self.qdrant_client.search(
                 collection_name=self.collection_name,
                 query_vector=query_vector,
+                search_params=QDRANT_SEARCH_PARAMS,
                 limit=limit,
                 with_payload=True
             )
-            
-            for result in results:
-                pid = result.payload.get('product_id', 'Unknown')
-                qdrant_results[pid] = {
-                    'id': pid,
-                    'name': result.payload.get('name', ''),
-                    'score': result.score 
-                }
+            qdrant_results = self._collect_qdrant_results(results)
             
         except Exception as e:
             print(f"Qdrant search error: {e}")
         
         return qdrant_results
     
+    def search_qdrant_many(self, queries, limit):
+
+        # One forward pass for the uncached queries, then one request for all searches
+        vectors = self._encode_queries(list(queries))
+        
+        try:
+            batches = self.qdrant_client.search_batch(
+                collection_name=self.collection_name,
+                requests=[SearchRequest(vector=v, limit=limit, 
+                                        params=QDRANT_SEARCH_PARAMS, with_payload=True) 
+                          for v in vectors]
+            )
+        except Exception as e:
+            print(f"Qdrant search error: {e}")
+            return [{} for _ in queries]
+        
+        return [self._collect_qdrant_results(results) for results in batches]
+    
+    def _collect_qdrant_results(self, results):
+        qdrant_results = {}
+        for result in results:
+            pid = result.payload.get('product_id', 'Unknown')
+            qdrant_results[pid] = {
+                'id': pid,
+                'name': result.payload.get('name', ''),
+                'score': result.score 
+            }
+        return qdrant_results
+    
     def normalize_scores(self, scores_dict, score_key = 'score'):
 
         if not scores_dict:
             return scores_dict
         
-        scores = [item[score_key] for item in scores_dict.values()]
-        min_score = min(scores)
-        max_score = max(scores)
+        items = list(scores_dict.values())
+        scores = np.fromiter((item[score_key] for item in items), dtype=np.float32, count=len(items))
+        min_score, max_score = scores.min(), scores.max()
         
         if max_score == min_score:
-            for item in scores_dict.values():
-                item['normalized_score'] = 1.0
+            normalized = np.ones_like(scores)
         else:
-            for item in scores_dict.values():
-                item['normalized_score'] = (item[score_key] - min_score) / (max_score - min_score)
+            normalized = (scores - min_score) / (max_score - min_score)
+        
+        for item, value in zip(items, normalized.tolist()):
+            item['normalized_score'] = value
         
         return scores_dict
     
-    def hybrid_search(self, query, neo4j_weight, qdrant_weight):
+    def hybrid_search(self, query, neo4j_weight = None, qdrant_weight = None):
 
         if not query.strip():
             return []
         
+        cache_key = (query, neo4j_weight, qdrant_weight)
+        cached = self._get_cached_results(cache_key)
+        if cached is not None:
+            return cached
+        
+        # The query embedding is computed inside search_qdrant, so it also
+        # overlaps with the Neo4j round-trips
+        fut_neo4j = self._pool.submit(self.search_neo4j, query, 20)
+        fut_qdrant = self._pool.submit(self.search_qdrant, query, 20)
+        neo4j_results = fut_neo4j.result()
+        qdrant_results = fut_qdrant.result()
+        
         print("\nQuerying Neo4j:")
-        neo4j_results = self.search_neo4j(query, limit=20)
         print(f" Found {len(neo4j_results)} products")
         
         print("\nQuerying Qdrant:")
-        qdrant_results = self.search_qdrant(query, limit=20)
         print(f" Found {len(qdrant_results)} products")
         
+        sorted_results = self._combine_results(neo4j_results, qdrant_results, 
+                                               neo4j_weight, qdrant_weight)
+        self._store_results(cache_key, sorted_results)
+        return sorted_results
+    
+    def hybrid_search_many(self, queries, neo4j_weight = None, qdrant_weight = None):
+
+        results = [[] for _ in queries]
+        pending = {}
+        for i, query in enumerate(queries):
+            if not query.strip():
+                continue
+            cached = self._get_cached_results((query, neo4j_weight, qdrant_weight))
+            if cached is not None:
+                results[i] = cached
+            else:
+                pending.setdefault(query, []).append(i)
+        
+        if not pending:
+            return results
+        
+        # Neo4j searches run on the pool while the queries are encoded together
+        # and sent to Qdrant as a single batch
+        unique_queries = list(pending)
+        neo4j_futures = [self._pool.submit(self.search_neo4j, query, 20) for query in unique_queries]
+        qdrant_batches = self.search_qdrant_many(unique_queries, 20)
+        
+        for query, fut_neo4j, qdrant_results in zip(unique_queries, neo4j_futures, qdrant_batches):
+            sorted_results = self._combine_results(fut_neo4j.result(), qdrant_results, 
+                                                   neo4j_weight, qdrant_weight)
+            self._store_results((query, neo4j_weight, qdrant_weight), sorted_results)
+            for i in pending[query]:
+                results[i] = sorted_results
+        
+        return results
+    
+    def _combine_results(self, neo4j_results, qdrant_results, neo4j_weight, qdrant_weight):
+
+        # Without explicit weights, fuse by rank alone
+        if neo4j_weight is None and qdrant_weight is None:
+            return self._rrf(neo4j_results, qdrant_results)
+        if neo4j_weight is None or qdrant_weight is None:
+            raise ValueError("Pass both neo4j_weight and qdrant_weight, or neither for RRF")
+        
         if neo4j_results:
             neo4j_results = self.normalize_scores(neo4j_results)
         if qdrant_results:
             qdrant_results = self.normalize_scores(qdrant_results)
         
-        combined_results = {}
+        # Parallel arrays over the union of product ids, Neo4j hits first,
+        # instead of one dict per product
+        ids = list(neo4j_results)
+        ids.extend(pid for pid in qdrant_results if pid not in neo4j_results)
+        n = len(ids)
+        names = [(neo4j_results.get(pid) or qdrant_results[pid])['name'] for pid in ids]
+        neo4j_scores = np.fromiter(
+            (neo4j_results[pid]['normalized_score'] if pid in neo4j_results else 0.0 for pid in ids),
+            dtype=np.float32, count=n
+        )
+        qdrant_scores = np.fromiter(
+            (qdrant_results[pid]['normalized_score'] if pid in qdrant_results else 0.0 for pid in ids),
+            dtype=np.float32, count=n
+        )
+        combined_scores = neo4j_weight * neo4j_scores + qdrant_weight * qdrant_scores
         
-        for pid, data in neo4j_results.items():
-            combined_results[pid] = {
-                'id': pid,
-                'name': data['name'],
-                'neo4j_score': data['normalized_score'],
-                'qdrant_score': 0,
-                'combined_score': neo4j_weight * data['normalized_score']
-            }
+        # Select the top 10 with a linear-time partition, then sort only those
+        # (in id order first, so ties keep the order of a full stable sort)
+        if n > 10:
+            top = np.sort(np.argpartition(-combined_scores, 10)[:10])
+        else:
+            top = np.arange(n)
+        top = top[np.argsort(-combined_scores[top], kind='stable')]
         
-        for pid, data in qdrant_results.items():
-            if pid in combined_results:
-                # Product found in both systems
-                combined_results[pid]['qdrant_score'] = data['normalized_score']
-                combined_results[pid]['combined_score'] = (
-                    neo4j_weight * combined_results[pid]['neo4j_score'] +
-                    qdrant_weight * data['normalized_score']
-                )
-            else:
-                # Product only in Qdrant
-                combined_results[pid] = {
-                    'id': pid,
-                    'name': data['name'],
-                    'neo4j_score': 0,
-                    'qdrant_score': data['normalized_score'],
-                    'combined_score': qdrant_weight * data['normalized_score']
-                }
-        
-        sorted_results = sorted(
-            combined_results.values(),
-            key=lambda x: x['combined_score'],
-            reverse=True
-        )[:10]
+        sorted_results = [
+            {
+                'id': ids[i],
+                'name': names[i],
+                'neo4j_score': float(neo4j_scores[i]),
+                'qdrant_score': float(qdrant_scores[i]),
+                'combined_score': float(combined_scores[i])
+            }
+            for i in top
+        ]
         
         return sorted_results
     
+    def _rrf(self, neo4j_results, qdrant_results, k = RRF_K):
+
+        # Reciprocal rank fusion: each engine adds 1/(k + rank) for every product
+        # it returns, so only the order of each list matters, not its score scale.
+        # pid -> [name, neo4j contribution, qdrant contribution], first-seen order
+        fused = {}
+        
+        for slot, results in ((1, neo4j_results), (2, qdrant_results)):
+            ranked = sorted(results.values(), key=lambda x: x['score'], reverse=True)
+            for rank, data in enumerate(ranked, 1):
+                entry = fused.get(data['id'])
+                if entry is None:
+                    entry = fused[data['id']] = [data['name'], 0.0, 0.0]
+                entry[slot] = 1.0 / (k + rank)
+        
+        # Only the ten best are needed, so skip sorting the rest
+        top = heapq.nlargest(10, fused.items(), key=lambda item: item[1][1] + item[1][2])
+        
+        return [
+            {
+                'id': pid,
+                'name': name,
+                'neo4j_score': neo4j_score,
+                'qdrant_score': qdrant_score,
+                'combined_score': neo4j_score + qdrant_score
+            }
+            for pid, (name, neo4j_score, qdrant_score) in top
+        ]
+    
+    def _get_cached_results(self, cache_key):
+        cached = self._result_cache.get(cache_key)
+        if cached is not None and time.monotonic() - cached[0] < RESULT_CACHE_TTL:
+            self._result_cache.move_to_end(cache_key)
+            return cached[1]
+        return None
+    
+    def _store_results(self, cache_key, sorted_results):
+        # Empty results may come from a backend error, so only cache real hits
+        if sorted_results:
+            self._result_cache[cache_key] = (time.monotonic(), sorted_results)
+            self._result_cache.move_to_end(cache_key)
+            while len(self._result_cache) > RESULT_CACHE_SIZE:
+                self._result_cache.popitem(last=False)
+    
     def format_results(self, results):
         if not results:
             return "\nNo products found."
@@ -260,9 +459,6 @@ class SimpleHybridSearch:
     
     def run_interactive_search(self):
         
-        neo4j_weight = 0.6
-        qdrant_weight = 0.4
-        
         while True:
             try:
                 query = input("\nEnter search query: ").strip()
@@ -270,7 +466,13 @@ class SimpleHybridSearch:
                 if query.lower() == 'exit':
                     break
                 
-                results = self.hybrid_search(query, neo4j_weight, qdrant_weight)
+                # After repopulating the databases, so cached results are not reused
+                if query.lower() == 'refresh':
+                    self.clear_cache()
+                    print("Result cache cleared")
+                    continue
+                
+                results = self.hybrid_search(query)
                 
                 print(self.format_results(results))
                 
@@ -285,13 +487,15 @@ def main():
     neo4j_password = os.environ.get('NEO4J_PASSWORD', 'password')
     qdrant_host = os.environ.get('QDRANT_HOST', 'localhost')
     qdrant_port = int(os.environ.get('QDRANT_PORT', '6334'))
+    qdrant_grpc_port = int(os.environ.get('QDRANT_GRPC_PORT', '6333'))
     
     search_system = SimpleHybridSearch(
         neo4j_uri=neo4j_uri,
         neo4j_user=neo4j_user,
         neo4j_password=neo4j_password,
         qdrant_host=qdrant_host,
-        qdrant_port=qdrant_port
+        qdrant_port=qdrant_port,
+        qdrant_grpc_port=qdrant_grpc_port
     )
     
     try:
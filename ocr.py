@@ -1,56 +1,108 @@
 import anthropic
+import asyncio
+import httpx
 import json
 import base64
+import hashlib
+import io
+import mmap
 import os
+import re
 import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Dict, List, Any
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# msgpack is a smaller, faster format for the intermediate record files
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# HTTP/2 needs the optional h2 package; without it httpx stays on HTTP/1.1
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# Pillow and pypdfium2 are optional; without them files are sent unchanged
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+try:
+    import pypdfium2 as pdfium
+except ImportError:
+    pdfium = None
+
+# pybase64 is a drop-in SIMD base64 encoder, several times faster on large files
+try:
+    import pybase64 as _b64
+except ImportError:
+    _b64 = base64
+
 from populate_neo4j_latest import populate_from_data as populate_neo4j_from_ocr_data
 from populate_qdrant import populate_from_data as populate_qdrant_from_ocr_data
 
-class ProductCatalogExtractor:
+# Raw bytes read per base64 block (57 KiB, a multiple of 3)
+BASE64_CHUNK_SIZE = 57 * 1024
 
-    def __init__(self, api_key: str = None):
-        """Initialize the extractor with Anthropic API key."""
-        self.api_key = api_key or os.environ.get('ANTHROPIC_API_KEY')
-        if not self.api_key:
-            raise ValueError("ANTHROPIC_API_KEY not found in environment variables")
-        
-        self.client = anthropic.Anthropic(api_key=self.api_key)
-        
-    def read_file_as_base64(self, file_path):
-        path = Path(file_path)
-        
-        if not path.exists():
-            raise FileNotFoundError(f"File not found: {file_path}")
-        
-        extension = path.suffix.lower()
-        media_type_map = {
-            '.pdf': 'application/pdf',
-            '.png': 'image/png',
-            '.jpg': 'image/jpeg',
-            '.jpeg': 'image/jpeg',
-            '.webp': 'image/webp',
-            '.gif': 'image/gif'
-        }
-        
-        media_type = media_type_map.get(extension)
-        if not media_type:
-            raise ValueError(f"Unsupported file type: {extension}")
-        
-        with open(file_path, 'rb') as f:
-            file_data = base64.standard_b64encode(f.read()).decode('utf-8')
-        
-        return file_data, media_type
-    
-    def extract_products_from_document(self, file_path):
+# Supported catalog file types, by extension
+_MEDIA_TYPES = {
+    '.pdf': 'application/pdf',
+    '.png': 'image/png',
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.webp': 'image/webp',
+    '.gif': 'image/gif'
+}
 
-        print(f"Processing document: {file_path}")
-        
-        file_data, media_type = self.read_file_as_base64(file_path)
-        
-        prompt = """From the attached machine tools catalog, identify and list all the product names along with description, short_description and attributes if available.  
+# Files larger than this are memory-mapped instead of read block by block
+MMAP_THRESHOLD = 64 * 1024 * 1024
+
+# Client-side compression: PDFs above the size threshold are re-rendered at
+# COMPRESS_PDF_DPI, images are downscaled to fit COMPRESS_MAX_IMAGE_SIDE
+COMPRESS_PDF_THRESHOLD = 5_000_000  # bytes
+COMPRESS_PDF_DPI = 150
+COMPRESS_MAX_IMAGE_SIDE = 2048
+COMPRESS_JPEG_QUALITY = 85
+
+# Output token budget per catalog; four catalogs per request keeps a
+# batched request within the model's 64k output limit
+MAX_OUTPUT_TOKENS = 16000
+CATALOGS_PER_REQUEST = 4
+
+# Extraction requests in flight at once, and threads hashing/encoding files
+EXTRACTION_CONCURRENCY = 8
+ENCODE_WORKERS = 8
+
+# Connections to the API are kept alive between requests of one run, so only
+# the first one pays for DNS and the TLS handshake. The pool is sized to the
+# request concurrency and closed with the client at the end of the run
+HTTP_LIMITS = httpx.Limits(
+    max_connections=EXTRACTION_CONCURRENCY,
+    max_keepalive_connections=EXTRACTION_CONCURRENCY,
+    keepalive_expiry=60
+)
+
+MODEL_ID = "claude-sonnet-4-20250514"
+
+# Markdown code fence around the model's JSON (opening, optional language tag, closing)
+_FENCE_RE = re.compile(r'^\s*```(?:json)?\s*|\s*```\s*$')
+
+# Extraction results are cached on disk per (file contents, prompt, model)
+OCR_CACHE_DIR = '.ocr_cache'
+OCR_CACHE_TTL = 7 * 24 * 60 * 60  # seconds
+
+EXTRACTION_PROMPT = """From the attached machine tools catalog, identify and list all the product names along with description, short_description and attributes if available.  
 
 INSTRUCTIONS:
 1. Extract ALL products visible in the catalog
@@ -105,50 +157,234 @@ CRITICAL POINTS:
 - If an attribute is mentioned multiple times with different values (like a range), include it appropriately
 - Return ONLY the JSON object, no additional text or markdown formatting"""
 
-        # Call Claude API with vision
+# Appended to the prompt when several catalogs share one request
+BATCH_EXTRACTION_SUFFIX = """
+
+MULTIPLE CATALOGS:
+- Several catalogs are attached, each preceded by a "Catalog N:" label
+- Extract the products of each catalog separately, following all the rules above
+- Instead of a single "products" object, return ONLY a JSON object with one entry per catalog:
+{"catalogs": [{"index": 1, "products": [...]}, {"index": 2, "products": [...]}]}"""
+
+# Short tag that changes whenever the extraction prompt is edited
+PROMPT_VERSION = hashlib.blake2b(EXTRACTION_PROMPT.encode('utf-8'), digest_size=4).hexdigest()
+
+
+def _json_loads(data):
+    # orjson.JSONDecodeError subclasses json.JSONDecodeError, so callers
+    # catch the same exception either way
+    return orjson.loads(data) if orjson else json.loads(data)
+
+
+def _json_dumps(data):
+    """Serialize to compact UTF-8 JSON bytes, with orjson when it is installed."""
+    if orjson:
+        return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+
+def _parse_response_json(response_text):
+    # The prompt asks for bare JSON, so try that first with no preprocessing
+    try:
+        return _json_loads(response_text)
+    except json.JSONDecodeError:
+        pass
+    
+    # Sometimes Claude wraps JSON in markdown code blocks
+    try:
+        return _json_loads(_FENCE_RE.sub('', response_text))
+    except json.JSONDecodeError:
+        pass
+    
+    # Last resort: decode from the first brace and ignore anything after the object
+    start = response_text.find('{')
+    if start < 0:
+        raise json.JSONDecodeError("No JSON object found", response_text, 0)
+    extracted_data, _ = json.JSONDecoder().raw_decode(response_text, start)
+    return extracted_data
+
+
+class ProductCatalogExtractor:
+
+    def __init__(self, api_key: str = None, compress: bool = True):
+        """Initialize the extractor with Anthropic API key."""
+        self.api_key = api_key or os.environ.get('ANTHROPIC_API_KEY')
+        if not self.api_key:
+            raise ValueError("ANTHROPIC_API_KEY not found in environment variables")
+        
+        # Shrink large uploads when Pillow/pypdfium2 are installed
+        self.compress = compress
+        
+        # Extractions already loaded or made in this process, by cache path
+        self._extraction_memo = {}
+        
+    def read_file_as_base64(self, file_path, compress: bool = False):
+        extension = Path(file_path).suffix.lower()
+        media_type = _MEDIA_TYPES.get(extension)
+        if not media_type:
+            raise ValueError(f"Unsupported file type: {extension}")
+        
+        if compress:
+            try:
+                compressed = self._compress_file(file_path, extension)
+            except Exception as e:
+                print(f"Could not compress {file_path}, sending it unchanged: {e}")
+                compressed = None
+            if compressed is not None:
+                return _b64.b64encode(compressed).decode('ascii'), media_type
+        
+        # A missing file surfaces as FileNotFoundError from open() below.
+        # Encode block by block instead of reading the whole file first; the
+        # block size is a multiple of 3, so no padding appears mid-stream
+        encoded = bytearray()
+        with open(file_path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if size > MMAP_THRESHOLD:
+                # Large catalogs: let the OS page the file in lazily
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    for offset in range(0, size, BASE64_CHUNK_SIZE):
+                        encoded += _b64.b64encode(mapped[offset:offset + BASE64_CHUNK_SIZE])
+            else:
+                for chunk in iter(lambda: f.read(BASE64_CHUNK_SIZE), b''):
+                    encoded += _b64.b64encode(chunk)
+        file_data = encoded.decode('ascii')
+        
+        return file_data, media_type
+    
+    def _compress_file(self, file_path, extension):
+        """Return a smaller re-encoding of the file, or None to send it as is."""
+        original_size = os.path.getsize(file_path)
+        
+        if extension == '.pdf':
+            if pdfium is None or Image is None or original_size <= COMPRESS_PDF_THRESHOLD:
+                return None
+            # Scanned catalogs are often 300 DPI; 150 DPI is enough to read them.
+            # Pages are rendered and written one at a time as JPEG images, so
+            # only one raster page is held in memory however long the PDF is
+            pdf = pdfium.PdfDocument(file_path)
+            out = pdfium.PdfDocument.new()
+            try:
+                if len(pdf) == 0:
+                    return None
+                for page in pdf:
+                    width, height = page.get_size()
+                    rendered = page.render(scale=COMPRESS_PDF_DPI / 72).to_pil().convert('RGB')
+                    page.close()
+                    jpeg = io.BytesIO()
+                    rendered.save(jpeg, format='JPEG', quality=COMPRESS_JPEG_QUALITY)
+                    del rendered
+                    jpeg.seek(0)
+                    
+                    image = pdfium.PdfImage.new(out)
+                    image.load_jpeg(jpeg, inline=True)
+                    image.set_matrix(pdfium.PdfMatrix().scale(width, height))
+                    new_page = out.new_page(width, height)
+                    new_page.insert_obj(image)
+                    new_page.gen_content()
+                    new_page.close()
+                buffer = io.BytesIO()
+                out.save(buffer)
+            finally:
+                out.close()
+                pdf.close()
+        elif extension in ('.png', '.jpg', '.jpeg', '.webp'):
+            if Image is None:
+                return None
+            with Image.open(file_path) as image:
+                if max(image.size) <= COMPRESS_MAX_IMAGE_SIDE:
+                    return None
+                image_format = image.format
+                image.thumbnail((COMPRESS_MAX_IMAGE_SIDE, COMPRESS_MAX_IMAGE_SIDE), Image.LANCZOS)
+                buffer = io.BytesIO()
+                image.save(buffer, format=image_format, quality=COMPRESS_JPEG_QUALITY, optimize=True)
+        else:
+            return None
+        
+        # Keep the original when re-encoding does not pay off
+        data = buffer.getvalue()
+        return data if len(data) < original_size else None
+    
+    def _file_digest(self, file_path):
+        digest = hashlib.blake2b(digest_size=16)
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(BASE64_CHUNK_SIZE), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+    
+    def _extraction_cache_path(self, digest):
+        # Keyed by the file contents, the prompt and the model, so changing any misses
+        key = f"{digest}-{PROMPT_VERSION}-{MODEL_ID}"
+        return os.path.join(OCR_CACHE_DIR, key + '.json')
+    
+    def _load_cached_extraction(self, cache_path):
+        if cache_path in self._extraction_memo:
+            return self._extraction_memo[cache_path]
         try:
-            message = self.client.messages.create(
-                model="claude-sonnet-4-20250514",
-                max_tokens=16000,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": [
-                            {
-                                "type": "document",
-                                "source": {
-                                    "type": "base64",
-                                    "media_type": media_type,
-                                    "data": file_data
-                                }
-                            },
-                            {
-                                "type": "text",
-                                "text": prompt
-                            }
-                        ]
-                    }
-                ]
+            if time.time() - os.path.getmtime(cache_path) < OCR_CACHE_TTL:
+                with open(cache_path, 'rb') as f:
+                    extracted_data = _json_loads(f.read())
+                self._extraction_memo[cache_path] = extracted_data
+                return extracted_data
+        except (OSError, json.JSONDecodeError):
+            pass
+        return None
+    
+    def _save_cached_extraction(self, cache_path, extracted_data):
+        self._extraction_memo[cache_path] = extracted_data
+        
+        # Write to a temporary file and rename, so readers never see a partial entry
+        try:
+            os.makedirs(OCR_CACHE_DIR, exist_ok=True)
+            tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(_json_dumps(extracted_data))
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            print(f"Could not cache extraction: {e}")
+    
+    def _document_block(self, file_path):
+        file_data, media_type = self.read_file_as_base64(file_path, compress=self.compress)
+        return {
+            "type": "document",
+            "source": {
+                "type": "base64",
+                "media_type": media_type,
+                "data": file_data
+            }
+        }
+    
+    def _new_client(self):
+        # Pooled connections belong to the event loop that opened them, so
+        # every run gets its own client inside its own loop
+        return anthropic.AsyncAnthropic(
+            api_key=self.api_key,
+            # The SDK's default client class keeps its timeouts and redirects
+            http_client=anthropic.DefaultAsyncHttpxClient(
+                http2=HTTP2_AVAILABLE,
+                limits=HTTP_LIMITS
             )
+        )
+    
+    async def _request_extraction(self, client, content, max_tokens, semaphore):
+        
+        # Call Claude API with vision, streaming the response as it is generated
+        response_text = ''
+        try:
+            async with semaphore:
+                async with client.messages.stream(
+                    model=MODEL_ID,
+                    max_tokens=max_tokens,
+                    messages=[
+                        {
+                            "role": "user",
+                            "content": content
+                        }
+                    ]
+                ) as stream:
+                    response_text = ''.join([text async for text in stream.text_stream])
             
-            # Extract response text
-            response_text = message.content[0].text
-            
-            # Parse JSON from response
-            # Sometimes Claude wraps JSON in markdown code blocks, so clean it
-            response_text = response_text.strip()
-            if response_text.startswith('```json'):
-                response_text = response_text[7:]
-            if response_text.startswith('```'):
-                response_text = response_text[3:]
-            if response_text.endswith('```'):
-                response_text = response_text[:-3]
-            response_text = response_text.strip()
-            
-            extracted_data = json.loads(response_text)
-            
-            print(f"Successfully extracted {len(extracted_data.get('products', []))} products")
-            return extracted_data
+            return _parse_response_json(response_text)
             
         except anthropic.APIError as e:
             print(f"API Error: {e}")
@@ -161,6 +397,151 @@ CRITICAL POINTS:
             print(f"Error during extraction: {e}")
             raise
     
+    async def _request_batch(self, client, file_paths, pending, semaphore, pool):
+        # One API call for the pending catalogs of a group; every catalog is
+        # its own document block and the response is split back per file
+        loop = asyncio.get_running_loop()
+        documents = await asyncio.gather(*(
+            loop.run_in_executor(pool, self._document_block, file_paths[i])
+            for i in pending
+        ))
+        
+        if len(pending) == 1:
+            # A lone document keeps the plain single-catalog prompt
+            content = [documents[0], {"type": "text", "text": EXTRACTION_PROMPT}]
+            return [await self._request_extraction(client, content, MAX_OUTPUT_TOKENS, semaphore)]
+        
+        content = []
+        for n, document in enumerate(documents, start=1):
+            content.append({"type": "text", "text": f"Catalog {n}:"})
+            content.append(document)
+        content.append({"type": "text", "text": EXTRACTION_PROMPT + BATCH_EXTRACTION_SUFFIX})
+        
+        # Output budget grows with the number of catalogs in the request
+        response = await self._request_extraction(
+            client, content, MAX_OUTPUT_TOKENS * len(pending), semaphore
+        )
+        # Anything but {"catalogs": [{...}, ...]} counts as no catalogs, so the
+        # affected files fall through to the separate requests below
+        catalogs = response.get('catalogs') if isinstance(response, dict) else None
+        if not isinstance(catalogs, list):
+            print(f"Unexpected batch response shape: {type(response).__name__}")
+            catalogs = []
+        
+        # The model sometimes writes the index as a string ("2")
+        by_index = {}
+        for catalog in catalogs:
+            if not isinstance(catalog, dict):
+                print(f"Ignoring malformed catalog entry: {catalog!r:.80}")
+                continue
+            try:
+                index = int(catalog.get('index'))
+            except (TypeError, ValueError):
+                print(f"Ignoring catalog with invalid index: {catalog.get('index')!r}")
+                continue
+            by_index[index] = {'products': catalog.get('products', [])}
+        
+        unmatched = sorted(set(by_index) - set(range(1, len(pending) + 1)))
+        if unmatched:
+            print(f"Ignoring catalogs with unknown indices: {unmatched}")
+        
+        # A catalog missing from the batch answer is asked for again on its own
+        # rather than recorded (and cached) as having no products
+        extracted = []
+        for n, (i, document) in enumerate(zip(pending, documents), start=1):
+            if n not in by_index:
+                print(f"No extraction returned for {file_paths[i]}, requesting it separately")
+                content = [document, {"type": "text", "text": EXTRACTION_PROMPT}]
+                by_index[n] = await self._request_extraction(client, content, MAX_OUTPUT_TOKENS, semaphore)
+            extracted.append(by_index[n])
+        return extracted
+    
+    async def _extract_batch(self, client, file_paths, digests, semaphore, prefetch, pool):
+        # Extract one group of distinct catalogs. Base64 encoding runs on the
+        # thread pool, overlapping the disk reads of one file with the encoding
+        # of another
+        results = [None] * len(file_paths)
+        pending = []
+        
+        cache_paths = [self._extraction_cache_path(digest) for digest in digests]
+        
+        # Same file and prompt as an earlier run: reuse its extraction
+        for i, file_path in enumerate(file_paths):
+            cached = self._load_cached_extraction(cache_paths[i])
+            if cached is not None:
+                print(f"Using cached extraction with {len(cached.get('products', []))} products")
+                results[i] = cached
+            else:
+                pending.append(i)
+        
+        if not pending:
+            return results
+        
+        # Encoding a group takes a prefetch slot, held until its request
+        # finishes. There are twice as many slots as request slots, so the next
+        # groups are encoded while earlier requests are in flight, without
+        # every queued group's payload sitting in memory at once
+        async with prefetch:
+            extracted = await self._request_batch(client, file_paths, pending, semaphore, pool)
+        
+        for i, extracted_data in zip(pending, extracted):
+            print(f"Successfully extracted {len(extracted_data.get('products', []))} products from {file_paths[i]}")
+            self._save_cached_extraction(cache_paths[i], extracted_data)
+            results[i] = extracted_data
+        
+        return results
+    
+    async def extract_products_async(self, file_paths: List[str]) -> List[Dict[str, Any]]:
+        """
+        Extract products from several catalogs concurrently.
+        
+        Catalogs are grouped CATALOGS_PER_REQUEST to a request and at most
+        EXTRACTION_CONCURRENCY requests are in flight at once, so K files
+        take about ceil(K / (group * concurrency)) round trips.
+        Results are returned in the order of file_paths.
+        """
+        loop = asyncio.get_running_loop()
+        semaphore = asyncio.Semaphore(EXTRACTION_CONCURRENCY)
+        prefetch = asyncio.Semaphore(2 * EXTRACTION_CONCURRENCY)
+        
+        async with self._new_client() as client:
+            with ThreadPoolExecutor(max_workers=max(1, min(ENCODE_WORKERS, len(file_paths)))) as pool:
+                for file_path in file_paths:
+                    print(f"Processing document: {file_path}")
+                digests = await asyncio.gather(*(
+                    loop.run_in_executor(pool, self._file_digest, file_path)
+                    for file_path in file_paths
+                ))
+                
+                # Identical files (e.g. re-versioned copies of a catalog) are
+                # sent once and their extraction is shared by every copy
+                unique = {}
+                for file_path, digest in zip(file_paths, digests):
+                    unique.setdefault(digest, file_path)
+                unique_digests = list(unique)
+                unique_paths = list(unique.values())
+                
+                batches = [
+                    (unique_paths[i:i + CATALOGS_PER_REQUEST], unique_digests[i:i + CATALOGS_PER_REQUEST])
+                    for i in range(0, len(unique_paths), CATALOGS_PER_REQUEST)
+                ]
+                results = await asyncio.gather(*(
+                    self._extract_batch(client, paths, batch_digests, semaphore, prefetch, pool)
+                    for paths, batch_digests in batches
+                ))
+        
+        by_digest = dict(zip(
+            unique_digests,
+            (extracted_data for batch in results for extracted_data in batch)
+        ))
+        return [by_digest[digest] for digest in digests]
+    
+    def extract_products_from_documents(self, file_paths: List[str]) -> List[Dict[str, Any]]:
+        return asyncio.run(self.extract_products_async(file_paths))
+    
+    def extract_products_from_document(self, file_path):
+        return self.extract_products_from_documents([file_path])[0]
+    
     def transform_for_neo4j(self, extracted_data):
 
         neo4j_products = []
@@ -172,17 +553,11 @@ CRITICAL POINTS:
                 'short_description': product.get('short_description', '')
             }
             
-            attributes_list = []
-            attributes = product.get('attributes', {})
-            
-            for key, value in attributes.items():
-                if value:  
-                    attributes_list.append({
-                        'key': key,
-                        'value': str(value)
-                    })
-            
-            neo4j_product['attributes'] = attributes_list
+            neo4j_product['attributes'] = [
+                {'key': key, 'value': str(value)}
+                for key, value in product.get('attributes', {}).items()
+                if value
+            ]
             
             neo4j_products.append(neo4j_product)
         
@@ -204,63 +579,140 @@ CRITICAL POINTS:
         
         return qdrant_products
     
+    def transform_both(self, extracted_data):
+        # Same output as transform_for_neo4j and transform_for_qdrant, built
+        # in one pass over the products
+        neo4j_products = []
+        qdrant_products = []
+        neo4j_append = neo4j_products.append
+        qdrant_append = qdrant_products.append
+        
+        for product in extracted_data.get('products', []):
+            get = product.get
+            product_id = product['product_id']
+            name = product['name']
+            short_description = get('short_description', '')
+            
+            neo4j_append({
+                'id': product_id,
+                'name': name,
+                'short_description': short_description,
+                'attributes': [
+                    {'key': key, 'value': str(value)}
+                    for key, value in get('attributes', {}).items()
+                    if value
+                ]
+            })
+            qdrant_append({
+                'id': product_id,
+                'name': name,
+                'short_description': short_description,
+                'description': get('description', '')
+            })
+        
+        return neo4j_products, qdrant_products
+    
     def save_json(self, data, filename):
         """Save data to JSON file."""
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
+        # Compact output: these files feed the database loaders, not readers
+        if orjson:
+            with open(filename, 'wb') as f:
+                f.write(_json_dumps(data))
+        else:
+            # json.dump writes encoder chunks as they are produced rather
+            # than building the whole document as one string first
+            with open(filename, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
         print(f"Saved data to {filename}")
     
+    def save_records(self, data, filename):
+        """Save records as JSON, plus a msgpack copy next to it if available."""
+        # The JSON file is always written, since the standalone loaders in
+        # populate_neo4j_latest.py and populate_qdrant.py read only JSON;
+        # populate.py prefers the msgpack copy, which is written second
+        self.save_json(data, filename)
+        if msgpack is None:
+            return
+        packed_path = Path(filename).with_suffix('.msgpack')
+        packed_path.write_bytes(msgpack.packb(data, use_bin_type=True))
+        print(f"Saved data to {packed_path}")
+    
     def populate_databases(self, neo4j_data, qdrant_data):
         
-        print("\nPOPULATING NEO4J DATABASE")
-        try:
-            populate_neo4j_from_ocr_data(neo4j_data)
-        except Exception as e:
-            print(f"Error populating Neo4j: {e}")
-            return False
-
-        print("\nPOPULATING QDRANT DATABASE")
-        try:
-            populate_qdrant_from_ocr_data(qdrant_data)
-        except Exception as e:
-            print(f"Error populating Qdrant: {e}")
-            return False
+        # The two loads are independent and mostly wait on the database
+        # drivers and on torch, which releases the GIL, so threads suffice
+        print("\nPOPULATING NEO4J AND QDRANT DATABASES")
+        success = True
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            futures = {
+                'Neo4j': pool.submit(populate_neo4j_from_ocr_data, neo4j_data),
+                'Qdrant': pool.submit(populate_qdrant_from_ocr_data, qdrant_data)
+            }
+            for name, future in futures.items():
+                try:
+                    future.result()
+                except Exception as e:
+                    print(f"Error populating {name}: {e}")
+                    success = False
 
-        return True
+        return success
     
-    def process_catalog(self, file_path):
-        
-        print("Step 1: Extracting products from document...")
-        extracted_data = self.extract_products_from_document(file_path)
+    def process_catalogs(self, file_paths, write_intermediate: bool = False):
         
-        print("\nStep 2: Transforming data for Neo4j")
-        neo4j_data = self.transform_for_neo4j(extracted_data)
-        self.save_json(neo4j_data, 'final_data_neo4j.json')
+        print("Step 1: Extracting products from documents...")
+        extractions = self.extract_products_from_documents(file_paths)
+        extracted_data = {
+            'products': [product for data in extractions for product in data.get('products', [])]
+        }
         
-        print("\nStep 3: Transforming data for Qdrant")
-        qdrant_data = self.transform_for_qdrant(extracted_data)
-        self.save_json(qdrant_data, 'final_data_qdrant.json')
+        print("\nStep 2: Transforming data for Neo4j and Qdrant")
+        neo4j_data, qdrant_data = self.transform_both(extracted_data)
         
-        print("\nStep 4: Populating databases")
-        success = self.populate_databases(neo4j_data, qdrant_data)
+        # The populators only read the in-memory lists, so the intermediate
+        # files (written only on request) are saved while the databases load
+        with ThreadPoolExecutor(max_workers=2) as writer:
+            writes = []
+            if write_intermediate:
+                print("\nStep 3: Saving transformed data in the background")
+                writes = [
+                    writer.submit(self.save_records, neo4j_data, 'final_data_neo4j.json'),
+                    writer.submit(self.save_records, qdrant_data, 'final_data_qdrant.json')
+                ]
+            
+            print("\nStep 4: Populating databases")
+            success = self.populate_databases(neo4j_data, qdrant_data)
+            
+            # Serialization errors (TypeError/ValueError from orjson or
+            # msgpack) must not hide the population result either
+            for future in writes:
+                try:
+                    future.result()
+                except Exception as e:
+                    print(f"Error saving transformed data: {e}")
         
         if success:
             print("\nWORKFLOW COMPLETE")
         else:
-            print("\nData files created but database population failed")
+            print("\nDatabase population failed")
+    
+    def process_catalog(self, file_path, write_intermediate: bool = False):
+        self.process_catalogs([file_path], write_intermediate=write_intermediate)
 
 def main():
 
-    if len(sys.argv) < 2:
-        print("\nExample: python ocr.py catalog.pdf")
-        sys.exit(1)
+    args = sys.argv[1:]
+    write_intermediate = '--write-intermediate' in args
+    file_paths = [arg for arg in args if arg != '--write-intermediate']
     
-    file_path = sys.argv[1]
-    
-    if not Path(file_path).exists():
-        print(f"Error: File not found: {file_path}")
+    if not file_paths:
+        print("\nExample: python ocr.py [--write-intermediate] catalog.pdf [more_catalogs.pdf ...]")
         sys.exit(1)
     
+    for file_path in file_paths:
+        if not Path(file_path).exists():
+            print(f"Error: File not found: {file_path}")
+            sys.exit(1)
+    
     try:
         extractor = ProductCatalogExtractor()
     except ValueError as e:
@@ -270,7 +722,7 @@ def main():
         sys.exit(1)
     
     try:
-        extractor.process_catalog(file_path)
+        extractor.process_catalogs(file_paths, write_intermediate=write_intermediate)
     except Exception as e:
         print(f"\nFatal error: {e}")
         sys.exit(1)
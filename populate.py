@@ -3,13 +3,33 @@ Simple script to populate Neo4j and Qdrant databases from products.json file.
 """
 import json
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import List, Dict, Any
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
 from populate_neo4j_latest import populate_from_data as populate_neo4j
 from populate_qdrant import populate_from_data as populate_qdrant
 
 
+def resolve_data_file(file_path: str) -> str:
+    """Prefer the .msgpack sibling written by ocr.py when it is at least as new as the JSON."""
+    path = Path(file_path)
+    packed = path.with_suffix('.msgpack')
+    if msgpack and packed.exists():
+        if not path.exists() or packed.stat().st_mtime >= path.stat().st_mtime:
+            return str(packed)
+    return file_path
+
 def load_products_json(file_path: str = "products.json") -> List[Dict[str, Any]]:
 
     path = Path(file_path)
@@ -19,8 +39,16 @@ def load_products_json(file_path: str = "products.json") -> List[Dict[str, Any]]
         sys.exit(1)
     
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            products = json.load(f)
+        # orjson parses several times faster; its JSONDecodeError subclasses
+        # json.JSONDecodeError, so the handler below covers both
+        if path.suffix == '.msgpack':
+            products = msgpack.unpackb(path.read_bytes(), raw=False)
+        elif orjson:
+            with open(file_path, 'rb') as f:
+                products = orjson.loads(f.read())
+        else:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                products = json.load(f)
         
         print(f"✓ Loaded {len(products)} products from {file_path}")
         return products
@@ -40,31 +68,28 @@ def main():
     print()
     
     # Step 1: Load products from JSON
-    products_neo4j = load_products_json("final_data_neo4j.json")
+    products_neo4j = load_products_json(resolve_data_file("final_data_neo4j.json"))
     print()
 
-    products_qdrant = load_products_json("final_data_qdrant.json")
+    products_qdrant = load_products_json(resolve_data_file("final_data_qdrant.json"))
     print()
     
-    # Step 4: Populate Neo4j
-    print("Step 4: Populating Neo4j Database")
+    # Step 4: Populate Neo4j and Qdrant side by side; the two loads are
+    # independent and spend their time in the drivers and in torch, which
+    # release the GIL
+    print("Step 4: Populating Neo4j and Qdrant Databases")
     print("-" * 70)
-    try:
-        populate_neo4j(products_neo4j)
-        print("✓ Neo4j population completed successfully")
-    except Exception as e:
-        print(f"✗ Error populating Neo4j: {e}")
-        print("Continuing with Qdrant...")
-    print()
-    
-    # Step 5: Populate Qdrant
-    print("Step 5: Populating Qdrant Database")
-    print("-" * 70)
-    try:
-        populate_qdrant(products_qdrant)
-        print("✓ Qdrant population completed successfully")
-    except Exception as e:
-        print(f"✗ Error populating Qdrant: {e}")
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        futures = {
+            'Neo4j': pool.submit(populate_neo4j, products_neo4j),
+            'Qdrant': pool.submit(populate_qdrant, products_qdrant)
+        }
+        for name, future in futures.items():
+            try:
+                future.result()
+                print(f"✓ {name} population completed successfully")
+            except Exception as e:
+                print(f"✗ Error populating {name}: {e}")
     print()
     
     # Summary
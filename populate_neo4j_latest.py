@@ -2,14 +2,42 @@ import json
 import os
 import sys
 import re
-from neo4j import GraphDatabase
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from itertools import islice
+from neo4j import GraphDatabase, WRITE_ACCESS
 from typing import Dict, List, Any, Set
 
+from search_utils import CODE_HYPHEN, find_mixed_codes
+
+try:
+    import ijson
+    JSON_ERRORS = (json.JSONDecodeError, ijson.JSONError)
+except ImportError:
+    ijson = None
+    JSON_ERRORS = (json.JSONDecodeError,)
+
+# Loader threads, each writing through its own session
+LOAD_WORKERS = 8
+
+_WORD_SPLIT = re.compile(r'[\s\-_,;:.()]+')
+
+
 class Neo4jProductLoader:
     
-    def __init__(self, uri, user, password, auto_create_schema = True):
+    def __init__(self, uri, user, password, auto_create_schema = True, num_workers = LOAD_WORKERS):
 
-        self.driver = GraphDatabase.driver(uri, auth=(user, password))
+        self.num_workers = num_workers
+        # Two connections per loader thread, so workers never wait on the pool
+        self.driver = GraphDatabase.driver(
+            uri,
+            auth=(user, password),
+            max_connection_pool_size=2 * num_workers,
+            connection_acquisition_timeout=60,
+            max_connection_lifetime=3600,
+            keep_alive=True,
+            fetch_size=1000
+        )
+        self._warmed_up = False
         
         if auto_create_schema:
             print("Initializing Neo4j schema and indexes")
@@ -22,6 +50,20 @@ class Neo4jProductLoader:
     def __enter__(self):
         return self
     
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+    
+    def warmup(self):
+        """Open a connection per worker up front so the first batches don't pay for handshakes."""
+        def ping():
+            with self.driver.session() as session:
+                session.run("RETURN 1").consume()
+        
+        with ThreadPoolExecutor(max_workers=self.num_workers) as pool:
+            for future in [pool.submit(ping) for _ in range(self.num_workers)]:
+                future.result()
+        self._warmed_up = True
+    
     def _create_schema_and_indexes(self):
         with self.driver.session() as session:
             session.run("""
@@ -64,6 +106,23 @@ class Neo4jProductLoader:
                 CREATE INDEX attribute_value_index IF NOT EXISTS
                 FOR (a:Attribute) ON (a.value)
             """)
+            
+            # Lowercased copies for case-insensitive CONTAINS matching at search time
+            session.run("""
+                CREATE TEXT INDEX attribute_key_lc_index IF NOT EXISTS
+                FOR (a:Attribute) ON (a.key_lc)
+            """)
+            
+            session.run("""
+                CREATE TEXT INDEX attribute_value_lc_index IF NOT EXISTS
+                FOR (a:Attribute) ON (a.value_lc)
+            """)
+            
+            # Backfill attributes created before the lowercased properties existed
+            session.run("""
+                MATCH (a:Attribute) WHERE a.key_lc IS NULL OR a.value_lc IS NULL
+                SET a.key_lc = toLower(toString(a.key)), a.value_lc = toLower(toString(a.value))
+            """)
     
     def check_existing_data(self) -> bool:
         """Check if database contains any data."""
@@ -124,17 +183,9 @@ class Neo4jProductLoader:
         if not text:
             return set()
         
-        codes = set()
-        
-        # Pattern 1: Alphanumeric with hyphens (e.g., AIUR-06-102J, CX-112)
-        pattern1 = r'\b[A-Z0-9]+(?:-[A-Z0-9]+)+\b'
-        found_codes = re.findall(pattern1, text.upper())
-        codes.update(found_codes)
-        
-        # Pattern 2: Mixed alphanumeric (at least one letter and one number, 4+ chars)
-        pattern2 = r'\b(?=.*[A-Z])(?=.*[0-9])[A-Z0-9]{4,}\b'
-        potential_codes = re.findall(pattern2, text.upper())
-        codes.update(potential_codes)
+        upper = text.upper()
+        codes = set(CODE_HYPHEN.findall(upper))
+        codes.update(find_mixed_codes(upper))
         
         return codes
     
@@ -168,20 +219,25 @@ class Neo4jProductLoader:
             search_terms.add(name.lower())
             
             # Extract and add product codes with variations
-            codes = self.extract_product_codes(name)
-            for code in codes:
-                search_terms.update(self.generate_code_variations(code))
+            variations = set()
+            for code in self.extract_product_codes(name):
+                variations.update(self.generate_code_variations(code))
+            search_terms.update(variations)
             
             # Add individual words (excluding codes)
-            # First remove codes from name to avoid duplication
+            # First remove codes from name to avoid duplication, all
+            # variations in one pass; longest first, so a variation that is
+            # a prefix of another cannot leave part of a code behind
             name_without_codes = name
-            for code in codes:
-                for variation in self.generate_code_variations(code):
-                    name_without_codes = re.sub(r'\b' + re.escape(variation) + r'\b', '', 
-                                               name_without_codes, flags=re.IGNORECASE)
+            if variations:
+                alternatives = sorted({v.lower() for v in variations}, key=len, reverse=True)
+                code_pattern = re.compile(
+                    r'\b(?:' + '|'.join(map(re.escape, alternatives)) + r')\b', re.IGNORECASE
+                )
+                name_without_codes = code_pattern.sub('', name)
             
             # Now add remaining words
-            words = re.split(r'[\s\-_,;:.()]+', name_without_codes)
+            words = _WORD_SPLIT.split(name_without_codes)
             for word in words:
                 word = word.strip().lower()
                 if len(word) > 1:  # Skip single chars
@@ -197,7 +253,7 @@ class Neo4jProductLoader:
                 search_terms.update(self.generate_code_variations(code))
             
             # Add important words from description (limit to avoid bloat)
-            desc_words = re.split(r'[\s\-_,;:.()]+', desc)[:20]  # First 20 words
+            desc_words = _WORD_SPLIT.split(desc)[:20]  # First 20 words
             for word in desc_words:
                 word = word.strip().lower()
                 if len(word) > 2:  # Slightly longer threshold for description
@@ -209,115 +265,173 @@ class Neo4jProductLoader:
     # NODE AND RELATIONSHIP CREATION
     # ========================================================================
     
-    def _create_product_node(self, tx, product_data: Dict[str, Any]):
-        """Create a Product node with pre-computed search terms."""
+    def _product_row(self, product_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Build the Product node parameters with pre-computed search terms."""
         # Extract search terms
         search_terms = self.extract_search_terms(product_data)
         
-        # Convert search terms set to space-separated string for full-text indexing
-        search_terms_str = ' '.join(search_terms)
-        
-        # Handle empty short_description
-        short_desc = product_data.get('short_description', '')
-        if not short_desc:
-            short_desc = ''
-            
+        return {
+            'id': product_data['id'],
+            'name': product_data['name'],
+            # Handle empty short_description
+            'short_description': product_data.get('short_description') or '',
+            'search_terms': ' '.join(search_terms),  # String for full-text search
+            'search_terms_list': list(search_terms)  # List for exact matching
+        }
+    
+    def _attribute_rows(self, product_id: str, 
+                        attributes: List[Dict[str, str]]) -> List[Dict[str, str]]:
+        """
+        Build attribute parameters for a product.
+        This method handles ANY attributes - no type restrictions.
+        """
+        return [
+            {
+                'product_id': product_id,
+                'key': attr['key'],
+                'value': attr['value'],
+                # Numeric and boolean values are valid in the extracted JSON;
+                # the value itself is stored as-is, its search copy as text
+                'key_lc': str(attr['key']).lower(),
+                'value_lc': str(attr['value']).lower()
+            }
+            for attr in attributes or ()
+            if attr.get('key') and attr.get('value')
+        ]
+    
+    def _create_product_nodes(self, tx, rows: List[Dict[str, Any]]):
+        """Create or update all Product nodes of a batch in one statement."""
         query = """
-            MERGE (p:Product {id: $id})
-            SET p.name = $name,
-                p.short_description = $short_description,
-                p.search_terms = $search_terms,
-                p.search_terms_list = $search_terms_list
-            RETURN p
+            UNWIND $rows AS row
+            MERGE (p:Product {id: row.id})
+            SET p.name = row.name,
+                p.short_description = row.short_description,
+                p.search_terms = row.search_terms,
+                p.search_terms_list = row.search_terms_list
         """
         
-        tx.run(query, 
-               id=product_data['id'],
-               name=product_data['name'],
-               short_description=short_desc,
-               search_terms=search_terms_str,  # String for full-text search
-               search_terms_list=list(search_terms))  # List for exact matching
+        tx.run(query, rows=rows)
         
-    def _create_attributes_and_relationships(self, tx, product_id: str, 
-                                            attributes: List[Dict[str, str]]):
-        """
-        Create attribute nodes and relationships to products.
-        This method handles ANY attributes - no type restrictions.
-        """
-        if not attributes: 
+    def _create_attributes_and_relationships(self, tx, rows: List[Dict[str, str]]):
+        """Create attribute nodes and relationships for a whole batch in one statement."""
+        if not rows: 
             return
             
-        for attr in attributes:
-            if not attr.get('key') or not attr.get('value'):  
-                continue
-                
-            query = """
-                MATCH (p:Product {id: $product_id})
-                MERGE (a:Attribute {key: $key, value: $value})
-                MERGE (p)-[:HAS_ATTRIBUTE]->(a)
-            """
-            
-            tx.run(query,
-                   product_id=product_id,
-                   key=attr['key'],
-                   value=attr['value'])
+        query = """
+            UNWIND $rows AS row
+            MATCH (p:Product {id: row.product_id})
+            MERGE (a:Attribute {key: row.key, value: row.value})
+            SET a.key_lc = row.key_lc, a.value_lc = row.value_lc
+            MERGE (p)-[:HAS_ATTRIBUTE]->(a)
+        """
+        
+        tx.run(query, rows=rows)
     
     # ========================================================================
     # DATA LOADING
     # ========================================================================
     
-    def _load_products(self, products: List[Dict[str, Any]], batch_size: int = 100):
+    def _write_batch(self, work, rows):
+        """Run work(tx, rows) as a managed write transaction."""
+        # execute_write commits when work returns, and rolls back and retries
+        # transient errors (e.g. deadlocks between workers) with backoff
+        with self.driver.session(default_access_mode=WRITE_ACCESS, fetch_size=1000) as session:
+            session.execute_write(work, rows)
+    
+    def _ingest_products(self, batch: List[Dict[str, Any]]) -> int:
+        # Search terms are computed on the worker thread as well
+        product_rows = [self._product_row(product) for product in batch]
+        self._write_batch(self._create_product_nodes, product_rows)
+        return len(batch)
+    
+    def _ingest_attributes(self, rows: List[Dict[str, str]], batch_size: int):
+        # Relationships lock their product too; taking product locks in the
+        # same order in every transaction makes deadlocks between bins rarer
+        rows.sort(key=lambda row: row['product_id'])
+        for i in range(0, len(rows), batch_size):
+            self._write_batch(self._create_attributes_and_relationships, rows[i:i + batch_size])
+    
+    def _load_products(self, products: List[Dict[str, Any]], batch_size: int = 100,
+                       num_workers: int = None):
         """
         Core method to load products into Neo4j.
         
         Args:
             products: List of product dictionaries
             batch_size: Number of products to process per batch
+            num_workers: Number of threads, each writing through its own session
+                         (defaults to the loader's num_workers)
         """
+        num_workers = num_workers or self.num_workers
+        if not self._warmed_up:
+            self.warmup()
+        
         print(f"Loading {len(products)} products into Neo4j")
         print("Pre-computing search terms and code variations...")
         
-        # Process products in batches
-        for i in range(0, len(products), batch_size):
-            batch = products[i:i + batch_size]
+        with ThreadPoolExecutor(max_workers=num_workers) as pool:
+            # Product batches touch disjoint nodes, so they load in parallel.
+            # One UNWIND statement per batch instead of a statement per product
+            futures = [
+                pool.submit(self._ingest_products, products[i:i + batch_size])
+                for i in range(0, len(products), batch_size)
+            ]
+            processed = 0
+            for future in as_completed(futures):
+                processed += future.result()
+                # Progress indicator
+                print(f"  Processed {processed}/{len(products)} products")
             
-            with self.driver.session() as session:
-                with session.begin_transaction() as tx:
-                    for product in batch:
-                        # Create Product node with search terms
-                        self._create_product_node(tx, product)
-                        
-                        # Create attributes (single array - handles ANY attributes)
-                        attributes = product.get('attributes', [])
-                        self._create_attributes_and_relationships(
-                            tx, product['id'], attributes
-                        )
-                    
-                    tx.commit()
+            # Attributes are shared between products; binning them by
+            # (key, value) gives every worker a disjoint set of Attribute
+            # nodes to MERGE, so workers never race on creating the same one
+            bins = [[] for _ in range(num_workers)]
+            for product in products:
+                for row in self._attribute_rows(product['id'], product.get('attributes', [])):
+                    bins[hash((row['key'], row['value'])) % num_workers].append(row)
             
-            # Progress indicator
-            processed = min(i + batch_size, len(products))
-            print(f"  Processed {processed}/{len(products)} products")
+            futures = [
+                pool.submit(self._ingest_attributes, rows, batch_size)
+                for rows in bins if rows
+            ]
+            for future in futures:
+                future.result()
         
         print(f"Successfully loaded {len(products)} products with pre-computed search terms")
     
-    def load_products_from_json(self, json_file_path: str):
+    def load_products_from_json(self, json_file_path: str, batch_size: int = 100):
         """
         Load products from a JSON file.
         
+        With ijson installed the file is streamed: products are parsed and
+        loaded one segment (a batch per worker) at a time, so memory stays
+        bounded by the segment rather than the file.
+        
         Args:
             json_file_path: Path to the JSON file containing products
+            batch_size: Number of products to process per batch
         """
         try:
-            with open(json_file_path, 'r', encoding='utf-8') as f:
-                products = json.load(f)
+            if ijson is None:
+                with open(json_file_path, 'r', encoding='utf-8') as f:
+                    products = json.load(f)
+                
+                self._load_products(products, batch_size)
+                return
             
-            self._load_products(products)
+            # ijson picks its fastest available backend (yajl2_c when built)
+            with open(json_file_path, 'rb') as f:
+                items = ijson.items(f, 'item', use_float=True)
+                while True:
+                    segment = list(islice(items, batch_size * self.num_workers))
+                    if not segment:
+                        break
+                    self._load_products(segment, batch_size)
             
         except FileNotFoundError:
             print(f"Error: File '{json_file_path}' not found")
             raise
-        except json.JSONDecodeError as e:
+        except JSON_ERRORS as e:
             print(f"Error: Invalid JSON in file '{json_file_path}': {e}")
             raise
         except Exception as e:
@@ -5,10 +5,20 @@ from typing import List, Dict, Any
 import pandas as pd
 from sentence_transformers import SentenceTransformer
 from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, VectorParams, PointStruct
+from qdrant_client.models import (
+    Distance, VectorParams, PointStruct,
+    ScalarQuantization, ScalarQuantizationConfig, ScalarType
+)
 from tqdm import tqdm
 
 
+# int8 scalar quantization kept in RAM; searches scan the quantized vectors
+# and rescore the top candidates against the original float32 vectors
+QUANTIZATION_CONFIG = ScalarQuantization(
+    scalar=ScalarQuantizationConfig(type=ScalarType.INT8, quantile=0.99, always_ram=True)
+)
+
+
 class QdrantProductLoader:
     """
     A modular Qdrant product loader for vector search functionality.
@@ -86,7 +96,8 @@ class QdrantProductLoader:
     def _ensure_collection_exists(self):
         """
         Ensure collection exists. Create if it doesn't exist.
-        If it exists, verify vector size compatibility.
+        If it exists, verify vector size compatibility and enable
+        int8 quantization if it was created without it.
         """
         if not self.collection_exists():
             # Create new collection
@@ -95,7 +106,8 @@ class QdrantProductLoader:
                 vectors_config=VectorParams(
                     size=self.vector_size,
                     distance=Distance.COSINE
-                )
+                ),
+                quantization_config=QUANTIZATION_CONFIG
             )
             print(f"Created new collection '{self.collection_name}' with vector size {self.vector_size}")
         else:
@@ -110,6 +122,13 @@ class QdrantProductLoader:
                     f"Please use a different collection name or delete the existing collection."
                 )
             
+            if collection_info.config.quantization_config is None:
+                self.client.update_collection(
+                    collection_name=self.collection_name,
+                    quantization_config=QUANTIZATION_CONFIG
+                )
+                print(f"Enabled int8 quantization on '{self.collection_name}'")
+            
             print(f"Using existing collection '{self.collection_name}'")
     
     # ========================================================================
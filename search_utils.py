@@ -0,0 +1,70 @@
+"""
+Helpers shared by the hybrid search scripts and the Neo4j loader.
+"""
+import re
+import threading
+
+# Characters Lucene's query parser treats as syntax (the same set as
+# QueryParser.escape), and the boolean operators it only recognizes in upper case
+_LUCENE_SPECIAL = re.compile(r'([+\-&|!(){}\[\]^"~*?:\\/])')
+_LUCENE_OPERATOR = re.compile(r'\b(AND|OR|NOT)\b')
+
+
+def escape_lucene(query):
+    # User queries go to db.index.fulltext.queryNodes as plain text; an
+    # unbalanced quote or a trailing AND would otherwise fail the whole search
+    query = _LUCENE_SPECIAL.sub(r'\\\1', query)
+    return _LUCENE_OPERATOR.sub(lambda m: m.group().lower(), query)
+
+
+# Product code patterns, matched against upper-cased text: alphanumeric with
+# hyphens (e.g. AIUR-06-102J, CX-112), and mixed alphanumeric (at least one
+# letter and one number, 4+ chars)
+CODE_HYPHEN = re.compile(r'\b[A-Z0-9]+(?:-[A-Z0-9]+)+\b')
+_CODE_RUN = re.compile(r'\b[A-Z0-9]{4,}\b')  # Candidate mixed alphanumeric codes
+_LETTER = re.compile(r'[A-Z]')
+_DIGIT = re.compile(r'[0-9]')
+
+
+def find_mixed_codes(text_up):
+    # Same matches as \b(?=.*[A-Z])(?=.*[0-9])[A-Z0-9]{4,}\b, but the letter and
+    # digit checks run once per candidate instead of as lookaheads at every position
+    codes = []
+    for m in _CODE_RUN.finditer(text_up):
+        line_end = text_up.find('\n', m.start())
+        if line_end < 0:
+            line_end = len(text_up)
+        if _LETTER.search(text_up, m.start(), line_end) and _DIGIT.search(text_up, m.start(), line_end):
+            codes.append(m.group())
+    return codes
+
+
+class ThreadSessions:
+    """
+    One long-lived Neo4j session per thread.
+    
+    Sessions are not thread-safe, so a search pool cannot share one; every
+    session handed out is tracked so close() can release them all.
+    """
+    
+    def __init__(self, driver, **session_config):
+        self._driver = driver
+        self._config = session_config
+        self._tls = threading.local()
+        self._sessions = []
+        self._lock = threading.Lock()
+    
+    def get(self):
+        session = getattr(self._tls, 'session', None)
+        if session is None:
+            session = self._driver.session(**self._config)
+            self._tls.session = session
+            with self._lock:
+                self._sessions.append(session)
+        return session
+    
+    def close(self):
+        with self._lock:
+            sessions, self._sessions = self._sessions, []
+        for session in sessions:
+            session.close()